@@ -3,6 +3,9 @@ from config import Config
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
+from util.job_events import JobEvents
+from util.job_queue import JobQueue
+from util.spool import Spool
 
 
 appvar = Flask(__name__, static_folder="static")
@@ -14,4 +17,10 @@ migrate = Migrate(appvar, db)
 login = LoginManager(appvar)
 login.login_view = 'login'
 
+jobs = JobQueue(max_workers=appvar.config["JOB_WORKERS"], ttl=appvar.config["JOB_TTL"])
+pdf_jobs = JobQueue(max_workers=appvar.config["PDF_JOB_WORKERS"], ttl=appvar.config["JOB_TTL"])
+job_events = JobEvents(ttl=appvar.config["JOB_TTL"])
+spool = Spool(directory=appvar.config["SPOOL_DIR"], memory_max=appvar.config["SPOOL_MEMORY_MAX"],
+    quota=appvar.config["SPOOL_QUOTA"], memory_quota=appvar.config["SPOOL_MEMORY_QUOTA"])
+
 from app import routes, models
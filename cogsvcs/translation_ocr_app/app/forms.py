@@ -1,45 +1,52 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, BooleanField, SubmitField, FileField, IntegerField, SelectField,TextAreaField
+from wtforms import StringField, PasswordField, BooleanField, SubmitField, FileField, IntegerField, SelectField,TextAreaField, SelectMultipleField
 from wtforms.validators import ValidationError, DataRequired, Email, EqualTo, Optional
 from flask_wtf.file import FileField, FileAllowed, FileRequired
 from app.models import User
-from util.lang_list import lang_list, ocr_lang_list
+from util.lang_list import ocr_lang_list
+from util import lang_catalogue
 
 class TranslatePDFForm(FlaskForm):
     upload = FileField('PDF to Translate', validators=[
         FileRequired(),
         FileAllowed(['pdf'], 'PDF\'s Only!')
     ])
-    from_lang = SelectField('From Language',
-        choices = [("xx","Guess")]+lang_list
-    )
-    to_lang = SelectField('To Language',
-        choices = [("en","English")]+lang_list
-    )
+    from_lang = SelectField('From Language')
+    to_lang = SelectField('To Language')
+    extra_langs = SelectMultipleField('Also Translate To', validators=[Optional()])
     submit = SubmitField('Translate')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.from_lang.choices = [("xx","Guess")]+lang_catalogue.choices()
+        self.to_lang.choices = [("en","English")]+lang_catalogue.choices()
+        self.extra_langs.choices = lang_catalogue.choices()
+
 class TranslateFreeText(FlaskForm):
     body = TextAreaField('Text to Translate', validators=[
         DataRequired()
     ])
-    to_lang = SelectField('To Language',
-        choices = [("en","English")]+lang_list
-    )
+    to_lang = SelectField('To Language')
     submit = SubmitField('Translate')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.to_lang.choices = [("en","English")]+lang_catalogue.choices()
+
 
 class DictionaryAlternativesForm(FlaskForm):
-    phrase = StringField('Text to Translate', validators=[
+    phrase = TextAreaField('Terms to Look Up (one per line)', validators=[
         DataRequired()
     ])
-    from_lang = SelectField('From Language',
-        choices = [("en","English")]+lang_list
-    )
-    to_lang = SelectField('To Language',
-        choices = lang_list
-    )
+    from_lang = SelectField('From Language')
+    to_lang = SelectField('To Language')
     submit = SubmitField('Translate')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.from_lang.choices = [("en","English")]+lang_catalogue.choices()
+        self.to_lang.choices = lang_catalogue.choices()
+
 class TranslateOCRForm(FlaskForm):
     upload = FileField('Picture to Translate', validators=[
         FileRequired(),
@@ -48,14 +55,18 @@ class TranslateOCRForm(FlaskForm):
     from_lang = SelectField('From Language',
         choices = [("xx","Guess"), ('en','English')]+ocr_lang_list
     )
-    to_lang = SelectField('To Language',
-        choices = [("en","English")]+lang_list
-    )
+    to_lang = SelectField('To Language')
+    extra_langs = SelectMultipleField('Also Translate To', validators=[Optional()])
     mode = SelectField("Document Type",
         choices=[("Printed","Printed"), ("Handwritten","Handwritten")]
     )
     submit = SubmitField('Translate')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.to_lang.choices = [("en","English")]+lang_catalogue.choices()
+        self.extra_langs.choices = lang_catalogue.choices()
+
 
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
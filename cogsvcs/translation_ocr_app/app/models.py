@@ -3,6 +3,12 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from flask_login import UserMixin
 from app import login
+from util.job_queue import QUEUED, DONE, FAILED
+import json
+
+# The stages a TranslationJob runs through between QUEUED and DONE/FAILED
+CRACKING = "cracking"
+TRANSLATING = "translating"
 
 
 
@@ -53,3 +59,58 @@ class Employee(TimestampMixin, db.Model):
             "department": self.department
         }
         return d
+
+
+class TranslationJob(TimestampMixin, db.Model):
+    """A PDF translated in the background, with how long each stage took"""
+    id = db.Column(db.String(36), primary_key=True)
+    filename = db.Column(db.String(255))
+    status = db.Column(db.String(16), index=True, default=QUEUED)
+    from_lang = db.Column(db.String(16))
+    to_langs = db.Column(db.String(255))
+    engine = db.Column(db.String(31))
+    ocr_pages = db.Column(db.Integer)
+    characters = db.Column(db.Integer)
+    warning = db.Column(db.String(255))
+    error = db.Column(db.String(1024))
+    started = db.Column(db.DateTime)
+    finished = db.Column(db.DateTime)
+    queue_seconds = db.Column(db.Float)
+    crack_seconds = db.Column(db.Float)
+    translate_seconds = db.Column(db.Float)
+    original = db.Column(db.Text)
+    results_json = db.Column(db.Text)
+
+    def __repr__(self):
+        return '<TranslationJob {} {}>'.format(self.id, self.status)
+
+    def target_languages(self):
+        return self.to_langs.split(",") if self.to_langs else []
+
+    def results(self):
+        return json.loads(self.results_json) if self.results_json else None
+
+    def is_finished(self):
+        return self.status in (DONE, FAILED)
+
+    def to_dict(self):
+        d = {
+            "id":self.id,
+            "filename":self.filename,
+            "status":self.status,
+            "from_lang":self.from_lang,
+            "to_langs":self.target_languages(),
+            "engine":self.engine,
+            "ocr_pages":self.ocr_pages,
+            "characters":self.characters,
+            "warning":self.warning,
+            "error":self.error,
+            "created":self.created.isoformat() if self.created else None,
+            "finished":self.finished.isoformat() if self.finished else None,
+            "seconds":{
+                "queued":self.queue_seconds,
+                "cracking":self.crack_seconds,
+                "translating":self.translate_seconds
+            }
+        }
+        return d
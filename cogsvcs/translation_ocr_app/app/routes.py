@@ -1,20 +1,61 @@
-from flask import render_template, redirect, url_for, flash, request, jsonify
-from app import appvar, db
+from flask import render_template, redirect, url_for, flash, request, jsonify, Response, g
+from app import appvar, db, jobs, pdf_jobs, job_events, spool
 from .forms import LoginForm, RegistrationForm, TranslatePDFForm, TranslateFreeText, DictionaryAlternativesForm, TranslateOCRForm
 
 from werkzeug.urls import url_parse
-from werkzeug.utils import secure_filename
 
 from flask_login import current_user, login_user
-from app.models import User, Employee
+from app.models import User, Employee, TranslationJob, CRACKING, TRANSLATING
 from flask_login import logout_user, login_required
 
 from util import doc_cracking
+from util import image_prep
 from util import api_calls
 from util import storage
-
+from util import lang_catalogue
+from util import metrics
+from util import quota
+from util.job_queue import QUEUED, DONE, FAILED
+from util.spool import SpoolFullError
+
+import functools
+import json
+import time
 import uuid
-import os
+from contextlib import ExitStack
+from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+
+REQUEST_SECONDS = metrics.histogram("translation_app_request_seconds",
+    "Time to handle a request, by route", ["route", "method", "status"])
+metrics.gauge("translation_app_jobs_pending", "Background jobs queued or running",
+    callback=lambda: {(): jobs.pending()})
+metrics.gauge("translation_app_pdf_jobs_pending", "PDF translations queued or running",
+    callback=lambda: {(): pdf_jobs.pending()})
+PDF_JOB_SECONDS = metrics.histogram("translation_app_pdf_job_stage_seconds",
+    "Time PDF translation jobs spend in each stage", ["stage"])
+
+
+@appvar.before_request
+def start_timer():
+    g.request_start = time.time()
+
+@appvar.after_request
+def note_status(response):
+    g.response_status = response.status_code
+    return response
+
+@appvar.teardown_request
+def record_request(exception=None):
+    # after_request is skipped when a view raises, so requests are timed here,
+    # labelled by route rule rather than path so job ids don't explode the series
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    status = 500 if exception is not None else g.get("response_status", 500)
+    REQUEST_SECONDS.observe(time.time() - g.get("request_start", time.time()), route=route, method=request.method, status=status)
+
+@appvar.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 
 @appvar.route('/login', methods=['GET', 'POST'])
@@ -54,18 +95,139 @@ def register():
     return render_template('register.html', title='Register', form=form)
 
 
+def target_languages(form):
+    """The selected target language followed by any extra ones, without repeats"""
+    to_langs = [form["to_lang"]]
+    for lang in form.getlist("extra_langs"):
+        if lang not in to_langs:
+            to_langs.append(lang)
+    return to_langs
+
+
 @appvar.route('/')
 @appvar.route('/index')
 def index():
     return render_template('index.html', title='Home')
 
 
+def crack_pdf(document):
+    """
+    Extract the text of document, recognizing its pages instead when it
+    looks scanned. Returns the cracked document and a warning, or None.
+    """
+    cracked = doc_cracking.crack_document(document, appvar.config["PDF_ENGINES"])
+    # Scanned pages have no text layer, so recognize them instead
+    if not doc_cracking.looks_scanned(cracked, appvar.config["OCR_MIN_PAGE_CHARS"]):
+        return cracked, None
+    try:
+        return doc_cracking.crack_scanned(document, api_calls.ocr_pages,
+            appvar.config["OCR_MIN_PAGE_CHARS"], appvar.config["OCR_DPI"]), None
+    except Exception as e:
+        # Keep what was cracked if recognition isn't possible
+        return cracked, "The document looks scanned but could not be recognized ({})".format(e)
+
+
+def pdf_translate_job(job_id, document, release, from_lang, to_langs):
+    """
+    Crack and translate an uploaded PDF, recording each stage on its
+    TranslationJob. release frees the upload's place in the spool, as soon
+    as the document has been read; calling it again does nothing. Progress
+    is published to job_events for pages following the job.
+    """
+    publish = functools.partial(job_events.publish, job_id)
+    with appvar.app_context():
+        job = TranslationJob.query.get(job_id)
+        try:
+            start = time.time()
+            job.started = datetime.utcnow()
+            job.queue_seconds = (job.started - job.created).total_seconds()
+            job.status = CRACKING
+            db.session.commit()
+            publish("status", {"status":CRACKING})
+            try:
+                cracked, job.warning = crack_pdf(document)
+            finally:
+                release()
+            original = cracked["content"]
+            job.engine = cracked["engine"]
+            job.ocr_pages = cracked.get("ocr_pages")
+            job.characters = len(original)
+            job.crack_seconds = time.time() - start
+            PDF_JOB_SECONDS.observe(job.crack_seconds, stage=CRACKING)
+
+            start = time.time()
+            # The "Guess" option is set to "xx"; identify the language locally
+            # and fall back to the service detecting it (a NoneType) if unsure
+            if from_lang == "xx":
+                from_lang = api_calls.guess_language(original)
+                job.from_lang = from_lang or "xx"
+            job.status = TRANSLATING
+            db.session.commit()
+            publish("status", {"status":TRANSLATING, "engine":job.engine, "characters":job.characters})
+            results = api_calls.translate_document_multi(original, from_lang, to_langs,
+                progress=lambda segments, done, total: publish("segments", segment_event(segments, done, total)))
+
+            job.original = original
+            job.results_json = json.dumps(results)
+            job.translate_seconds = time.time() - start
+            PDF_JOB_SECONDS.observe(job.translate_seconds, stage=TRANSLATING)
+            job.status = DONE
+        except Exception as e:
+            db.session.rollback()
+            job.error = (str(e) or e.__class__.__name__)[:1024]
+            job.status = FAILED
+            raise
+        finally:
+            release()
+            job.finished = datetime.utcnow()
+            db.session.commit()
+            publish("status", {"status":job.status, "error":job.error}, last=True)
+            db.session.remove()
+
+def fail_interrupted_jobs():
+    """
+    Mark PDF jobs left unfinished by the last run of the server as failed.
+    Their work was queued in that process, so nothing is going to finish
+    them and their pages would wait forever. Call once at startup, before
+    any server process takes uploads.
+    """
+    with appvar.app_context():
+        try:
+            interrupted = TranslationJob.query.filter(TranslationJob.status.in_([QUEUED, CRACKING, TRANSLATING])).all()
+            for job in interrupted:
+                job.status = FAILED
+                job.error = "The server restarted before the document was translated; please upload it again"
+                job.finished = datetime.utcnow()
+            db.session.commit()
+        except SQLAlchemyError as e:
+            # Most likely the translation_job table hasn't been created yet
+            db.session.rollback()
+            print("Could not check for interrupted PDF jobs: {}".format(getattr(e, "orig", e)))
+            return 0
+        finally:
+            db.session.remove()
+    return len(interrupted)
+
+@appvar.cli.command("fail-interrupted-jobs")
+def fail_interrupted_jobs_command():
+    """Mark PDF jobs a stopped server left unfinished as failed."""
+    print("{} interrupted PDF jobs marked failed".format(fail_interrupted_jobs()))
+
+def segment_event(segments, done, total):
+    """What a page following a job needs to show segments as they are translated"""
+    return {
+        "done":done,
+        "total":total,
+        "segments":[{"index":index, "text":text, "tail":tail,
+            "translations":{to_lang: result["content"] for to_lang, result in results.items()}}
+            for index, text, tail, results in segments]
+    }
+
+
 @appvar.route('/translate/pdf', methods=['GET', 'POST'])
 def translate_pdf():
     form = TranslatePDFForm()
     title = "Translate PDF Document"
-    results = None
-    original = None
 
     if request.method == "POST":
         if 'upload' not in request.files:
@@ -78,32 +240,78 @@ def translate_pdf():
             return redirect(request.url)
         
         if file:
-            fname, ext = os.path.splitext(file.filename)
-            fname_rand = fname + str(uuid.uuid4()) + ext
-            filename = secure_filename(fname_rand)
-
-            pdf_local_path = os.path.join(appvar.config["UPLOAD_FOLDER"], filename)
-
-            file.save(pdf_local_path)
-
-            # Crack the document
-            original = doc_cracking.crack_pdf(pdf_local_path)
-            # Translate the document
-
-            from_lang = request.form["from_lang"]
-            # The "Guess" option is set to "xx" but the api expects a NoneType 
-            # to come through to generate a detect language call
-            if from_lang == "xx":
-                from_lang = None
-            to_lang = request.form["to_lang"]
-
-            results = api_calls.translate_text(original, from_lang, to_lang)
+            # The upload is held in the spool (large files on disk) until a
+            # background worker has cracked it, and the page polls for the result
+            with ExitStack() as stack:
+                try:
+                    document = stack.enter_context(spool.open(file.stream))
+                except SpoolFullError as e:
+                    flash(str(e))
+                    return redirect(request.url)
+
+                to_langs = target_languages(request.form)
+                job = TranslationJob(id=str(uuid.uuid4()), filename=file.filename[:255],
+                    from_lang=request.form["from_lang"], to_langs=",".join(to_langs))
+                db.session.add(job)
+                db.session.commit()
+                job_events.publish(job.id, "status", {"status":job.status})
+                pdf_jobs.submit(pdf_translate_job, job.id, document, stack.pop_all().close,
+                    request.form["from_lang"], to_langs)
+            return redirect(url_for('translate_pdf_job', job_id=job.id))
     
-    return render_template("translate_document.html",title=title, form=form, original=original,results = results)
+    return render_template("translate_document.html",title=title, form=form)
+
+@appvar.route('/translate/pdf/jobs/<job_id>')
+def translate_pdf_job(job_id):
+    job = TranslationJob.query.get_or_404(job_id)
+    if job.warning:
+        flash(job.warning)
+    return render_template("translate_document.html", title="Translate PDF Document", form=TranslatePDFForm(),
+        job=job, original=job.original, results=job.results())
+
+@appvar.route('/translate/pdf/jobs/<job_id>/events')
+def translate_pdf_job_events(job_id):
+    """
+    Server-sent events for a job: its stage as it changes and each group of
+    segments as soon as it is translated. A reconnecting page resumes after
+    the Last-Event-ID it was given.
+    """
+    job = TranslationJob.query.get(job_id)
+    if job is None:
+        return jsonify({"error":"Unknown job"}), 404
+    status = {"status":job.status, "error":job.error}
+    try:
+        after = int(request.headers.get("Last-Event-ID", 0))
+    except ValueError:
+        after = 0
+
+    def generate():
+        yield "retry: 3000\n\n"
+        followed = False
+        for event in job_events.follow(job_id, after):
+            followed = True
+            if event is None:
+                # A comment keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            event_id, kind, data = event
+            yield "id: {}\nevent: {}\ndata: {}\n\n".format(event_id, kind, json.dumps(data))
+        if not followed:
+            # Nothing in memory (it finished long ago or runs in another process), so report what was stored
+            yield "event: status\ndata: {}\n\n".format(json.dumps(status))
+
+    return Response(generate(), mimetype="text/event-stream", headers={"Cache-Control":"no-cache", "X-Accel-Buffering":"no"})
+
+@appvar.route('/translate/pdf/jobs/<job_id>/status')
+def translate_pdf_job_status(job_id):
+    job = TranslationJob.query.get(job_id)
+    if job is None:
+        return jsonify({"error":"Unknown job"}), 404
+    return jsonify(job.to_dict())
 
 @appvar.route('/translate/available', methods=['GET', 'POST'])
 def translate_available():
-    results = api_calls.list_languages()
+    results = lang_catalogue.languages()
     return render_template("list_languages.html",title="Languages", results=results)
 
 @appvar.route('/translate/freetext', methods=['GET', 'POST'])
@@ -119,11 +327,63 @@ def translate_freetext():
             return redirect(request.url)
         
         original = request.form["body"]
-        results = api_calls.translate_text(original, from_lang = None, to_lang=request.form["to_lang"])
+        results = api_calls.translate_text(original, from_lang = api_calls.guess_language(original), to_lang=request.form["to_lang"])
 
     return render_template("translate_docfree.html",title=title, form=form, original=original, results = results)
 
 
+def parse_bulk_request(mimetype, body, query):
+    """
+    (texts, from_lang, to_lang) from a bulk translation request; query maps
+    each parameter to a list of values. Raises ValueError if it is malformed.
+    Shared with the async version of the endpoint in asgi.py.
+    """
+    if mimetype == "application/x-ndjson":
+        try:
+            texts = [json.loads(line)["text"] for line in body.splitlines() if line.strip()]
+        except (ValueError, KeyError, TypeError):
+            raise ValueError("Each line must be a JSON object with a text field")
+        params = {name: values[0] for name, values in query.items()}
+    else:
+        try:
+            params = json.loads(body) if mimetype == "application/json" else {}
+        except ValueError:
+            params = {}
+        if not isinstance(params, dict):
+            params = {}
+        texts = params.get("texts")
+
+    to_lang = params.get("to_lang")
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts) or not to_lang:
+        raise ValueError("texts (a list of strings) and to_lang are required")
+    return texts, params.get("from_lang") or None, to_lang
+
+
+@appvar.route('/api/translate', methods=['POST'])
+def api_translate():
+    """
+    Bulk translation for batch systems. The body is either a JSON object
+    {"texts": [...], "to_lang": "de", "from_lang": "en"} or NDJSON with one
+    {"text": ...} object per line and from_lang/to_lang in the query string.
+    Leaving out from_lang auto-detects it. Results are streamed back as NDJSON,
+    one {"index", "content", "language"} line per text as soon as its batch
+    completes.
+    """
+    try:
+        texts, from_lang, to_lang = parse_bulk_request(request.mimetype, request.get_data(as_text=True),
+            request.args.to_dict(flat=False))
+    except ValueError as e:
+        return jsonify({"error":str(e)}), 400
+
+    def generate():
+        # Batch work gives way to people waiting on a page
+        with quota.bulk():
+            for index, result in api_calls.translate_many(texts, from_lang, to_lang):
+                yield json.dumps(dict(result, index=index)) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
 @appvar.route('/translate/freetext/alternative', methods=['GET', 'POST'])
 def translate_alternative():
     form = DictionaryAlternativesForm()
@@ -138,22 +398,66 @@ def translate_alternative():
             print("Hit loop back")
             return redirect(request.url)
     
-        original = request.form["phrase"]
-        results = api_calls.translate_alternatives(original, request.form["from_lang"], request.form["to_lang"])
+        original = request.form["phrase"].splitlines()
+        results = api_calls.lookup_alternatives(original, request.form["from_lang"], request.form["to_lang"])
 
-        if len(results) == 0:
+        if not any(results.values()):
+            results = None
             error = "No results, please refine your search."
 
     
     return render_template("dictionary_lookup.html",title=title, form=form, original=original, results = results, error = error)
 
 
+def ocr_translate_job(image, ocr_from_lang, mode, from_lang, to_langs):
+    # Pull out the text inside the image, sent upright, scaled down and
+    # grayscale, which is all recognition needs and much quicker to send
+    original = api_calls.ocr_image(img_url = None, from_lang= ocr_from_lang, mode=mode, img_bytes=image,
+        prepare=image_prep.prepare)
+    # Only now is there text to tell the language from
+    if from_lang is None:
+        from_lang = api_calls.guess_language(original)
+    # Take text and translate into every requested language at once
+    translations = api_calls.translate_document_multi(original, from_lang, to_langs)
+    # A list keeps the languages in the order they were asked for
+    results = [dict(translations[to_lang], to=to_lang) for to_lang in to_langs]
+    return {"original":original, "results":results}
+
+def parse_ocr_request(query):
+    """
+    (ocr_from_lang, mode, from_lang, to_langs) for an image posted to
+    /api/ocr; query maps each parameter to a list of values. Raises
+    ValueError if no target language is given.
+    """
+    from_lang = query.get("from_lang", ["xx"])[0]
+    to_langs = list(dict.fromkeys(query.get("to_lang", [])))
+    if not to_langs:
+        raise ValueError("to_lang is required")
+    mode = query.get("mode", ["Printed"])[0]
+    if from_lang == "xx":
+        return "unk", mode, None, to_langs
+    return from_lang, mode, from_lang, to_langs
+
+@appvar.route('/api/ocr', methods=['POST'])
+def api_ocr():
+    """
+    Recognize and translate the image in the request body. The query string
+    has to_lang (repeat it for more languages) and optionally from_lang and
+    mode (Printed or Handwritten). Answers with {"original", "results"}.
+    """
+    try:
+        ocr_from_lang, mode, from_lang, to_langs = parse_ocr_request(request.args.to_dict(flat=False))
+    except ValueError as e:
+        return jsonify({"error":str(e)}), 400
+    image = request.get_data()
+    storage.save_bytes_async(image, "api-upload", request.mimetype)
+    return jsonify(ocr_translate_job(image, ocr_from_lang, mode, from_lang, to_langs))
+
 @appvar.route('/translate/ocr', methods=['GET', 'POST'])
 def translate_ocr():
     form = TranslateOCRForm()
     title = "Translate Image with OCR"
-    results = None
-    original = None
+    job_id = None
 
     if request.method == "POST":
         if 'upload' not in request.files:
@@ -166,25 +470,28 @@ def translate_ocr():
             return redirect(request.url)
         
         if file:
-            # Save the document to blob and get back the new file name
-            secure_file_name = storage.save_image(request, "upload")
-            # Generage Image URL with SAS token for viewing
-            img_url = storage.generate_img_url(secure_file_name)
-            # Pull out the text inside the image
+            # The image goes straight to the OCR service; keeping a copy in
+            # blob storage happens in the background, off the hot path
+            image = file.read()
+            storage.save_bytes_async(image, file.filename, file.mimetype)
             _ocr_from_lang = request.form["from_lang"] if request.form["from_lang"] != "xx" else "unk"
-            ocr_results = api_calls.ocr_image(img_url = img_url, from_lang= _ocr_from_lang, mode=request.form["mode"] )
-
-            # Define the "original" text
-            original = ocr_results
-            # Take text and translate
 
             from_lang = request.form["from_lang"]
             # The "Guess" option is set to "xx" but the api expects a NoneType 
             # to come through to generate a detect language call
             if from_lang == "xx":
                 from_lang = None
-            to_lang = request.form["to_lang"]
+            to_langs = target_languages(request.form)
 
-            results = api_calls.translate_text(original, from_lang, to_lang)
+            # Recognition can take several seconds, so hand it to a background
+            # worker and let the page poll for the result
+            job_id = jobs.submit(ocr_translate_job, image, _ocr_from_lang, request.form["mode"], from_lang, to_langs)
     
-    return render_template("translate_ocr.html", title=title, form=form, original=original,results = results)
\ No newline at end of file
+    return render_template("translate_ocr.html", title=title, form=form, job_id=job_id)
+
+@appvar.route('/translate/ocr/jobs/<job_id>')
+def translate_ocr_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error":"Unknown job"}), 404
+    return jsonify({"id":job["id"], "status":job["status"], "result":job["result"], "error":job["error"]})
@@ -1,5 +1,7 @@
 from app import appvar, db
 from app.models import User
+from app.routes import fail_interrupted_jobs
 
 if __name__ == '__main__':
+  fail_interrupted_jobs()
   appvar.run()
\ No newline at end of file
@@ -0,0 +1,134 @@
+"""
+Serve the app over ASGI, for example with
+
+    uvicorn asgi:application --port 5000
+
+The bulk translation and OCR APIs run on the event loop, so a slow
+Translator or Vision call holds a coroutine rather than a thread and one
+process can keep hundreds of them in flight. Every other route is the
+Flask app, each request run on its own thread through asgiref.
+"""
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+
+from app import appvar
+from app.routes import REQUEST_SECONDS, parse_bulk_request, parse_ocr_request
+from util import api_calls
+from util import async_api_calls
+from util import async_http
+from util import async_storage
+from util import image_prep
+from util import quota
+
+flask_app = WsgiToAsgi(appvar)
+
+
+def _query(scope):
+    return parse_qs(scope.get("query_string", b"").decode("latin-1"))
+
+
+def _mimetype(scope):
+    for name, value in scope.get("headers", []):
+        if name == b"content-type":
+            return value.decode("latin-1").split(";", 1)[0].strip().lower()
+    return ""
+
+
+async def _read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def _start(send, status, content_type):
+    await send({"type":"http.response.start", "status":status,
+        "headers":[(b"content-type", content_type.encode("latin-1"))]})
+
+
+async def _send_json(send, status, obj):
+    await _start(send, status, "application/json")
+    await send({"type":"http.response.body", "body":json.dumps(obj).encode("utf-8")})
+
+
+async def api_translate(scope, receive, send):
+    """The coroutine version of routes.api_translate"""
+    body = (await _read_body(receive)).decode("utf-8")
+    try:
+        texts, from_lang, to_lang = parse_bulk_request(_mimetype(scope), body, _query(scope))
+    except ValueError as e:
+        return await _send_json(send, 400, {"error":str(e)})
+
+    await _start(send, 200, "application/x-ndjson")
+    with quota.bulk():
+        async for index, result in async_api_calls.translate_many(texts, from_lang, to_lang):
+            line = json.dumps(dict(result, index=index)) + "\n"
+            await send({"type":"http.response.body", "body":line.encode("utf-8"), "more_body":True})
+    await send({"type":"http.response.body", "body":b""})
+
+
+async def api_ocr(scope, receive, send):
+    """The coroutine version of routes.api_ocr"""
+    try:
+        ocr_from_lang, mode, from_lang, to_langs = parse_ocr_request(_query(scope))
+    except ValueError as e:
+        return await _send_json(send, 400, {"error":str(e)})
+    image = await _read_body(receive)
+    # Archiving happens alongside recognition and isn't waited for
+    asyncio.ensure_future(async_storage.archive_bytes(image, "api-upload", _mimetype(scope)))
+
+    original = await async_api_calls.ocr_image(img_url = None, from_lang = ocr_from_lang, mode = mode, img_bytes = image,
+        prepare = image_prep.prepare)
+    if from_lang is None:
+        from_lang = api_calls.guess_language(original)
+    translations = await async_api_calls.translate_document_multi(original, from_lang, to_langs)
+    await _send_json(send, 200, {"original":original,
+        "results":[dict(translations[to_lang], to=to_lang) for to_lang in to_langs]})
+
+
+ROUTES = {
+    ("POST", "/api/translate"):api_translate,
+    ("POST", "/api/ocr"):api_ocr
+}
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type":"lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await async_http.close_sessions()
+            await send({"type":"lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+
+    handler = ROUTES.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+    if handler is None:
+        # A context per request gives each Flask request a thread of its own
+        async with ThreadSensitiveContext():
+            return await flask_app(scope, receive, send)
+
+    status = {"code":500}
+
+    async def send_with_status(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+        await send(message)
+
+    start = time.time()
+    try:
+        await handler(scope, receive, send_with_status)
+    finally:
+        REQUEST_SECONDS.observe(time.time() - start, route=scope["path"], method=scope["method"], status=status["code"])
@@ -24,8 +24,96 @@ class Config(object):
     BLOB_ACCT_NAME = os.environ.get("BLOB_ACCT_NAME")
     BLOB_KEY = os.environ.get("BLOB_KEY")
     BLOB_URL = os.environ.get("BLOB_URL")
+    BLOB_ENDPOINT = os.environ.get("BLOB_ENDPOINT")
+    # Uploads are streamed in blocks of BLOB_BLOCK_SIZE bytes, BLOB_UPLOAD_WORKERS at a time
+    BLOB_BLOCK_SIZE = int(os.environ.get("BLOB_BLOCK_SIZE", 4*1024*1024))
+    BLOB_UPLOAD_WORKERS = int(os.environ.get("BLOB_UPLOAD_WORKERS", 4))
+    BLOB_ARCHIVE_WORKERS = int(os.environ.get("BLOB_ARCHIVE_WORKERS", 2))
+
+    # Shared HTTP client: pool size is per endpoint, timeouts and backoff in seconds
+    HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 10))
+    # The ASGI app waits on connections with coroutines, so it can keep many more open
+    ASYNC_HTTP_POOL_SIZE = int(os.environ.get("ASYNC_HTTP_POOL_SIZE", 100))
+    HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 30))
+    HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", 3))
+    HTTP_BACKOFF = float(os.environ.get("HTTP_BACKOFF", 0.5))
+    HTTP_BACKOFF_MAX = float(os.environ.get("HTTP_BACKOFF_MAX", 30))
+
+    # Client-side pacing per subscription key, set to the pricing tier's limits (0 turns a limit off).
+    # The defaults are the S1 tiers: Translator's 40M characters an hour and Vision's 10 calls a second
+    TRANSLATOR_CHARS_PER_MINUTE = int(os.environ.get("TRANSLATOR_CHARS_PER_MINUTE", 666666))
+    TRANSLATOR_CALLS_PER_SECOND = float(os.environ.get("TRANSLATOR_CALLS_PER_SECOND", 0))
+    VISION_CALLS_PER_SECOND = float(os.environ.get("VISION_CALLS_PER_SECOND", 10))
+    # How far ahead of the steady rate a burst may run, in seconds of quota
+    QUOTA_BURST_SECONDS = float(os.environ.get("QUOTA_BURST_SECONDS", 1))
+
+    # Long documents are split into batches that respect the Translator
+    # per-request limits and sent concurrently
+    TRANSLATE_MAX_ELEMENTS = int(os.environ.get("TRANSLATE_MAX_ELEMENTS", 100))
+    TRANSLATE_MAX_CHARS = int(os.environ.get("TRANSLATE_MAX_CHARS", 5000))
+    TRANSLATE_WORKERS = int(os.environ.get("TRANSLATE_WORKERS", 8))
+    # Requests from bulk work (/api/translate, translate_folder.py) have their own workers
+    TRANSLATE_BULK_WORKERS = int(os.environ.get("TRANSLATE_BULK_WORKERS", 4))
+    DICTIONARY_MAX_TERMS = int(os.environ.get("DICTIONARY_MAX_TERMS", 10))
+
+    # Translation results are cached in memory and in a local SQLite file (TTL in seconds)
+    TRANSLATION_CACHE_PATH = os.environ.get("TRANSLATION_CACHE_PATH") or \
+        os.path.join(basedir, 'translation_cache.db')
+    TRANSLATION_CACHE_MEMORY_SIZE = int(os.environ.get("TRANSLATION_CACHE_MEMORY_SIZE", 1024))
+    TRANSLATION_CACHE_MAX_ENTRIES = int(os.environ.get("TRANSLATION_CACHE_MAX_ENTRIES", 100000))
+    TRANSLATION_CACHE_TTL = int(os.environ.get("TRANSLATION_CACHE_TTL", 7*24*3600))
+
+    # Sentence-level translation memory reused across document revisions
+    TRANSLATION_MEMORY_PATH = os.environ.get("TRANSLATION_MEMORY_PATH") or \
+        os.path.join(basedir, 'translation_memory.db')
     
-    UPLOAD_FOLDER = os.path.join(basedir, 'app', 'uploads')
+    # Languages catalogue, revalidated in the background once older than the TTL (seconds)
+    LANGUAGE_CACHE_PATH = os.environ.get("LANGUAGE_CACHE_PATH") or \
+        os.path.join(basedir, 'languages.json')
+    LANGUAGE_CACHE_TTL = int(os.environ.get("LANGUAGE_CACHE_TTL", 24*3600))
+    # How long to wait after a failed revalidation before trying again (seconds)
+    LANGUAGE_CACHE_RETRY = int(os.environ.get("LANGUAGE_CACHE_RETRY", 300))
+
+    # Background workers for OCR requests and how handwriting results are polled (seconds)
+    JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+    JOB_TTL = int(os.environ.get("JOB_TTL", 3600))
+    OCR_POLL_INITIAL = float(os.environ.get("OCR_POLL_INITIAL", 0.5))
+    OCR_POLL_BACKOFF = float(os.environ.get("OCR_POLL_BACKOFF", 1.5))
+    OCR_POLL_MAX = float(os.environ.get("OCR_POLL_MAX", 5))
+    OCR_POLL_TIMEOUT = float(os.environ.get("OCR_POLL_TIMEOUT", 120))
+
+    # Background workers that crack and translate uploaded PDFs
+    PDF_JOB_WORKERS = int(os.environ.get("PDF_JOB_WORKERS", 4))
+
+    # Scanned PDF pages (under OCR_MIN_PAGE_CHARS of text) are rendered at
+    # OCR_DPI and recognized OCR_PAGE_WORKERS pages at a time
+    OCR_PAGE_WORKERS = int(os.environ.get("OCR_PAGE_WORKERS", 8))
+    OCR_MIN_PAGE_CHARS = int(os.environ.get("OCR_MIN_PAGE_CHARS", 20))
+    OCR_DPI = int(os.environ.get("OCR_DPI", 200))
+
+    # Uploaded images are turned upright, scaled to fit OCR_PREP_*_MAX_SIDE pixels, made grayscale
+    # and recompressed before OCR; ones under OCR_PREP_MIN_BYTES that need none of it go as they are
+    OCR_PREP_PRINTED_MAX_SIDE = int(os.environ.get("OCR_PREP_PRINTED_MAX_SIDE", 2600))
+    OCR_PREP_HANDWRITTEN_MAX_SIDE = int(os.environ.get("OCR_PREP_HANDWRITTEN_MAX_SIDE", 3200))
+    OCR_PREP_GRAYSCALE = os.environ.get("OCR_PREP_GRAYSCALE", "1") == "1"
+    OCR_PREP_QUALITY = int(os.environ.get("OCR_PREP_QUALITY", 85))
+    OCR_PREP_MIN_BYTES = int(os.environ.get("OCR_PREP_MIN_BYTES", 256*1024))
+    # The Vision service turns away images over 4MB
+    OCR_PREP_MAX_BYTES = int(os.environ.get("OCR_PREP_MAX_BYTES", 4*1024*1024))
+
+    # Source languages guessed locally below this confidence are left to the service to detect
+    LANGID_MIN_CONFIDENCE = float(os.environ.get("LANGID_MIN_CONFIDENCE", 0.5))
+
+    # PDF text extraction engines, tried in order
+    PDF_ENGINES = os.environ.get("PDF_ENGINES", "pdfminer,tika").split(",")
+
+    # Uploads up to SPOOL_MEMORY_MAX bytes are processed in memory, SPOOL_MEMORY_QUOTA
+    # bytes across all of them; the rest are spooled to SPOOL_DIR (the system temp
+    # dir by default), SPOOL_QUOTA bytes at most
+    SPOOL_DIR = os.environ.get("SPOOL_DIR")
+    SPOOL_MEMORY_MAX = int(os.environ.get("SPOOL_MEMORY_MAX", 8*1024*1024))
+    SPOOL_MEMORY_QUOTA = int(os.environ.get("SPOOL_MEMORY_QUOTA", 64*1024*1024))
+    SPOOL_QUOTA = int(os.environ.get("SPOOL_QUOTA", 512*1024*1024))
 
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'SECRET-KEY'
     SQLALCHEMY_DATABASE_URI = sqlAlchCON or \
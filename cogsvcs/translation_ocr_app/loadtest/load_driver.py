@@ -0,0 +1,150 @@
+"""
+Drive load against a running translation app and report requests/sec and
+latency percentiles per route. Run the app against stub_services.py to
+measure performance changes without touching the real services.
+"""
+import os
+import threading
+import time
+
+import requests
+
+appdir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SAMPLE_PDF = os.path.join(appdir, 'pdfs', 'weinachtsabend_de.pdf')
+SAMPLE_IMAGE = os.path.join(appdir, 'img', 'example-english.jpg')
+SAMPLE_TEXT = "Marley war tot, damit wollen wir anfangen. Ein Zweifel darüber kann nicht stattfinden."
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _poll_job(session, base_url, job_url):
+    """Wait for a background job so its latency covers the whole result"""
+    while True:
+        job = session.get(base_url + job_url).json()
+        if job["status"] in ("done", "failed"):
+            return job["status"] == "done"
+        time.sleep(0.1)
+
+
+def scenario_freetext(session, base_url, samples):
+    response = session.post(base_url + '/translate/freetext', data={"body":SAMPLE_TEXT, "to_lang":"en"})
+    return response.status_code == 200
+
+
+def scenario_alternatives(session, base_url, samples):
+    response = session.post(base_url + '/translate/freetext/alternative',
+        data={"phrase":"house\nfly\nrun", "from_lang":"en", "to_lang":"de"})
+    return response.status_code == 200
+
+
+def scenario_available(session, base_url, samples):
+    return session.get(base_url + '/translate/available').status_code == 200
+
+
+def scenario_api(session, base_url, samples):
+    response = session.post(base_url + '/api/translate', json={"texts":[SAMPLE_TEXT] * 20, "to_lang":"en"})
+    return response.status_code == 200 and len(response.text.splitlines()) == 20
+
+
+def scenario_pdf(session, base_url, samples):
+    response = session.post(base_url + '/translate/pdf',
+        data={"from_lang":"de", "to_lang":"en"},
+        files={"upload":("sample.pdf", samples["pdf"], "application/pdf")})
+    # The upload redirects to the job's page; anywhere else means it was turned away
+    marker = '/translate/pdf/jobs/'
+    start = response.url.find(marker)
+    if response.status_code != 200 or start < 0:
+        return False
+    return _poll_job(session, base_url, response.url[start:] + '/status')
+
+
+def scenario_ocr(session, base_url, samples):
+    response = session.post(base_url + '/translate/ocr',
+        data={"from_lang":"en", "to_lang":"de", "mode":"Printed"},
+        files={"upload":("sample.jpg", samples["image"], "image/jpeg")})
+    if response.status_code != 200:
+        return False
+    marker = '/translate/ocr/jobs/'
+    start = response.text.find(marker)
+    if start < 0:
+        return True
+    end = response.text.find('"', start)
+    return _poll_job(session, base_url, response.text[start:end])
+
+
+SCENARIOS = {
+    "freetext":scenario_freetext,
+    "alternatives":scenario_alternatives,
+    "available":scenario_available,
+    "api":scenario_api,
+    "pdf":scenario_pdf,
+    "ocr":scenario_ocr
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(values))))
+    return values[min(rank, len(values)) - 1]
+
+
+def run(base_url, scenarios, concurrency, duration):
+    samples = {"pdf":_read(SAMPLE_PDF), "image":_read(SAMPLE_IMAGE)}
+    results = {name: {"latencies":[], "errors":0} for name in scenarios}
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def worker(offset):
+        session = requests.Session()
+        i = offset
+        while time.time() < deadline:
+            name = scenarios[i % len(scenarios)]
+            i += 1
+            start = time.time()
+            try:
+                ok = SCENARIOS[name](session, base_url, samples)
+            except requests.RequestException:
+                ok = False
+            elapsed = time.time() - start
+            with lock:
+                results[name]["latencies"].append(elapsed)
+                if not ok:
+                    results[name]["errors"] += 1
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.time() - started
+
+
+def report(results, elapsed):
+    print("{:<14}{:>8}{:>8}{:>10}{:>10}{:>10}{:>10}".format("route", "count", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms"))
+    for name, result in results.items():
+        latencies = sorted(result["latencies"])
+        print("{:<14}{:>8}{:>8}{:>10.1f}{:>10.0f}{:>10.0f}{:>10.0f}".format(
+            name, len(latencies), result["errors"], len(latencies) / elapsed,
+            1000 * percentile(latencies, 50), 1000 * percentile(latencies, 95), 1000 * percentile(latencies, 99)))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argparser = argparse.ArgumentParser(description="Load test the translation app")
+    argparser.add_argument("-u", "--base-url", default="http://localhost:5000")
+    argparser.add_argument("-c", "--concurrency", type=int, default=8)
+    argparser.add_argument("-d", "--duration", type=float, default=30, help="Seconds to run for")
+    argparser.add_argument("-s", "--scenarios", default=",".join(SCENARIOS),
+        help="Comma separated routes to exercise: {}".format(", ".join(SCENARIOS)))
+    args = argparser.parse_args()
+
+    results, elapsed = run(args.base_url.rstrip("/"), args.scenarios.split(","), args.concurrency, args.duration)
+    report(results, elapsed)
@@ -0,0 +1,229 @@
+"""
+Local stand-ins for the Translator v3, Computer Vision and Blob Storage
+endpoints the app calls, so the app can be load tested without spending
+quota. Point the app at it with:
+
+    $env:LANGUAGE_URL='http://localhost:5001'
+    $env:VISION_URL='http://localhost:5001/vision/v2.0/'
+    $env:BLOB_ENDPOINT='http://localhost:5001'
+    $env:BLOB_ACCT_NAME='stub'
+    $env:BLOB_KEY='c3R1Yg=='
+
+Responses have the same shape as the real services; the "translation" of a
+text is the text tagged with the target language.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from email.utils import formatdate
+
+from flask import Flask, Response, request, jsonify
+
+stub = Flask(__name__)
+
+settings = {
+    "latency":0.05,       # seconds added to every call
+    "jitter":0.02,        # +/- seconds of random variation
+    "error_rate":0.0,     # fraction of calls answered with a 500
+    "rate_limit":0.0,     # calls per second per service before answering 429, 0 for unlimited
+    "ocr_seconds":2.0     # time before a handwriting operation succeeds
+}
+
+LANGUAGES = {
+    "de":{"name":"German", "nativeName":"Deutsch", "dir":"ltr"},
+    "en":{"name":"English", "nativeName":"English", "dir":"ltr"},
+    "es":{"name":"Spanish", "nativeName":"Español", "dir":"ltr"},
+    "fr":{"name":"French", "nativeName":"Français", "dir":"ltr"},
+    "it":{"name":"Italian", "nativeName":"Italiano", "dir":"ltr"},
+    "ja":{"name":"Japanese", "nativeName":"日本語", "dir":"ltr"}
+}
+LANGUAGES_ETAG = '"{}"'.format(hashlib.sha1(json.dumps(LANGUAGES, sort_keys=True).encode()).hexdigest())
+
+_buckets = {}
+_operations = {}
+_blobs = {}
+_blocks = {}
+_lock = threading.Lock()
+
+
+def _throttled(service):
+    """A token bucket per service; True if this call is over the rate limit"""
+    rate = settings["rate_limit"]
+    if rate <= 0:
+        return False
+    now = time.time()
+    with _lock:
+        tokens, last = _buckets.get(service, (rate, now))
+        tokens = min(rate, tokens + (now - last) * rate)
+        if tokens < 1:
+            _buckets[service] = (tokens, now)
+            return True
+        _buckets[service] = (tokens - 1, now)
+        return False
+
+
+def _simulate(service):
+    """Sleep for the configured latency and maybe fail; returns an error response or None"""
+    time.sleep(max(0.0, settings["latency"] + random.uniform(-settings["jitter"], settings["jitter"])))
+    if _throttled(service):
+        response = jsonify({"error":{"code":429000, "message":"Too many requests (stub)"}})
+        response.status_code = 429
+        response.headers["Retry-After"] = "1"
+        return response
+    if random.random() < settings["error_rate"]:
+        response = jsonify({"error":{"code":500000, "message":"Injected failure (stub)"}})
+        response.status_code = 500
+        return response
+    return None
+
+
+def _texts():
+    return [item["Text"] for item in request.get_json(force=True)]
+
+
+@stub.route('/translate', methods=['POST'])
+def translate():
+    error = _simulate("translator")
+    if error is not None:
+        return error
+    to_langs = request.args.getlist("to")
+    results = []
+    for text in _texts():
+        item = {"translations":[{"text":"[{}] {}".format(to_lang, text), "to":to_lang} for to_lang in to_langs]}
+        if "from" not in request.args:
+            item["detectedLanguage"] = {"language":"de", "score":1.0}
+        results.append(item)
+    return jsonify(results)
+
+
+@stub.route('/detect', methods=['POST'])
+def detect():
+    error = _simulate("translator")
+    if error is not None:
+        return error
+    return jsonify([{"language":"de", "score":1.0, "isTranslationSupported":True} for _ in _texts()])
+
+
+@stub.route('/dictionary/lookup', methods=['POST'])
+def dictionary_lookup():
+    error = _simulate("translator")
+    if error is not None:
+        return error
+    to_lang = request.args.get("to")
+    return jsonify([
+        {"normalizedSource":text.lower(), "displaySource":text, "translations":[
+            {"normalizedTarget":"[{}] {}".format(to_lang, text.lower()), "displayTarget":"[{}] {}".format(to_lang, text),
+                "posTag":"NOUN", "confidence":1.0, "prefixWord":"", "backTranslations":[]}
+        ]}
+        for text in _texts()
+    ])
+
+
+@stub.route('/languages', methods=['GET'])
+def languages():
+    error = _simulate("translator")
+    if error is not None:
+        return error
+    if request.headers.get("If-None-Match") == LANGUAGES_ETAG:
+        return Response(status=304, headers={"ETag":LANGUAGES_ETAG})
+    response = jsonify({"translation":LANGUAGES})
+    response.headers["ETag"] = LANGUAGES_ETAG
+    return response
+
+
+@stub.route('/vision/v2.0/ocr', methods=['POST'])
+def ocr():
+    error = _simulate("vision")
+    if error is not None:
+        return error
+    words = [{"boundingBox":"0,0,10,10", "text":word} for word in "Stub text recognized from the image".split()]
+    return jsonify({"language":request.args.get("language", "unk"), "orientation":"Up", "regions":[
+        {"boundingBox":"0,0,100,10", "lines":[{"boundingBox":"0,0,100,10", "words":words}]}
+    ]})
+
+
+@stub.route('/vision/v2.0/recognizeText', methods=['POST'])
+def recognize_text():
+    error = _simulate("vision")
+    if error is not None:
+        return error
+    operation_id = str(uuid.uuid4())
+    with _lock:
+        _operations[operation_id] = time.time() + settings["ocr_seconds"]
+    response = Response(status=202)
+    response.headers["Operation-Location"] = "{}vision/v2.0/textOperations/{}".format(request.host_url, operation_id)
+    return response
+
+
+@stub.route('/vision/v2.0/textOperations/<operation_id>', methods=['GET'])
+def text_operation(operation_id):
+    error = _simulate("vision")
+    if error is not None:
+        return error
+    ready = _operations.get(operation_id)
+    if ready is None:
+        return jsonify({"error":{"code":"NotFound", "message":"Unknown operation"}}), 404
+    if time.time() < ready:
+        return jsonify({"status":"Running"})
+    return jsonify({"status":"Succeeded", "recognitionResult":{"lines":[
+        {"boundingBox":[0, 0, 10, 0, 10, 10, 0, 10], "text":"Stub handwritten line one"},
+        {"boundingBox":[0, 20, 10, 20, 10, 30, 0, 30], "text":"Stub handwritten line two"}
+    ]}})
+
+
+def _blob_headers():
+    # The storage SDK parses these from every blob response
+    return {"ETag":'"{}"'.format(uuid.uuid4()), "Last-Modified":formatdate(usegmt=True)}
+
+
+@stub.route('/<container>/<path:blob>', methods=['PUT'])
+def put_blob(container, blob):
+    error = _simulate("blob")
+    if error is not None:
+        return error
+    key = (container, blob)
+    comp = request.args.get("comp")
+    with _lock:
+        if comp == "block":
+            _blocks.setdefault(key, {})[request.args["blockid"]] = request.get_data()
+        elif comp == "blocklist":
+            # Only the ids matter here; commit them in the listed order
+            body = request.get_data(as_text=True)
+            ids = [part.split("<", 1)[0] for part in body.split("<Latest>")[1:]]
+            blocks = _blocks.pop(key, {})
+            _blobs[key] = b"".join(blocks[block_id] for block_id in ids)
+        else:
+            _blobs[key] = request.get_data()
+    return Response(status=201, headers=_blob_headers())
+
+
+@stub.route('/<container>/<path:blob>', methods=['GET', 'HEAD'])
+def get_blob(container, blob):
+    error = _simulate("blob")
+    if error is not None:
+        return error
+    content = _blobs.get((container, blob))
+    if content is None:
+        return Response(status=404, headers={"x-ms-error-code":"BlobNotFound"})
+    return Response(content, mimetype="application/octet-stream",
+        headers=dict(_blob_headers(), **{"x-ms-blob-type":"BlockBlob"}))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argparser = argparse.ArgumentParser(description="Stand-in Translator, Vision and Blob services")
+    argparser.add_argument("--port", type=int, default=5001)
+    argparser.add_argument("--latency", type=float, default=settings["latency"], help="Seconds added to every call")
+    argparser.add_argument("--jitter", type=float, default=settings["jitter"], help="Random +/- seconds on the latency")
+    argparser.add_argument("--error-rate", type=float, default=settings["error_rate"], help="Fraction of calls that fail with a 500")
+    argparser.add_argument("--rate-limit", type=float, default=settings["rate_limit"], help="Calls per second per service before 429s, 0 for none")
+    argparser.add_argument("--ocr-seconds", type=float, default=settings["ocr_seconds"], help="Seconds until a handwriting operation succeeds")
+    args = argparser.parse_args()
+
+    settings.update(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit=args.rate_limit, ocr_seconds=args.ocr_seconds)
+    stub.run(port=args.port, threaded=True)
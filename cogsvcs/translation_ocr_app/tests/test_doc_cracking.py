@@ -0,0 +1,58 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+import pytest
+from app import appvar
+from app import routes
+from util import doc_cracking
+
+try:
+    import fitz
+except ImportError:
+    fitz = None
+needs_fitz = pytest.mark.skipif(fitz is None, reason="PyMuPDF is not installed")
+
+def _scanned_pdf():
+    """Two pages with a text layer around one that is only an image"""
+    pdf = fitz.open()
+    pdf.new_page().insert_text((72, 72), "First page with a text layer")
+    scan = fitz.open()
+    scan.new_page().insert_text((72, 72), "Only visible as pixels")
+    image = scan[0].get_pixmap().tobytes("png")
+    page = pdf.new_page()
+    page.insert_image(page.rect, stream=image)
+    pdf.new_page().insert_text((72, 72), "Third page with a text layer")
+    return pdf.tobytes()
+
+@needs_fitz
+def test_only_image_pages_are_recognized_and_kept_in_order():
+    seen = []
+    def ocr_pages(images):
+        images = list(images)
+        seen.extend(images)
+        return ["Recognized page"] * len(images)
+
+    cracked = doc_cracking.crack_scanned(_scanned_pdf(), ocr_pages, min_chars=5)
+
+    assert len(seen) == 1 and seen[0].startswith(b"\x89PNG")
+    assert cracked["ocr_pages"] == 1
+    lines = [line for line in cracked["content"].splitlines() if line.strip()]
+    assert lines == ["First page with a text layer", "Recognized page", "Third page with a text layer"]
+
+@needs_fitz
+def test_looks_scanned():
+    pytest.importorskip("pdfminer")
+    cracked = doc_cracking.crack_document(_scanned_pdf(), ["pdfminer"])
+
+    assert cracked["pages"] == 3
+    assert doc_cracking.looks_scanned(cracked, 20)
+    assert not doc_cracking.looks_scanned(dict(cracked, content="x" * 100), 20)
+
+def test_documents_cracked_by_tika_are_not_checked_for_scans(monkeypatch):
+    monkeypatch.setitem(doc_cracking.ENGINES, "tika", lambda fp: ("Short", None))
+    monkeypatch.setitem(appvar.config, "PDF_ENGINES", ["pdfminer", "tika"])
+
+    cracked, warning = routes.crack_pdf(b"not a PDF pdfminer can open")
+
+    assert cracked["engine"] == "tika" and cracked["content"] == "Short"
+    assert warning is None
@@ -0,0 +1,103 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+from email.utils import formatdate
+import time
+import pytest
+import requests
+from app import appvar
+from util import http_client
+
+class FakeResponse(object):
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+class FakeSession(object):
+    """Answers each request with the next outcome: a status, a (status, headers) pair or an exception"""
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        if isinstance(outcome, tuple):
+            return FakeResponse(*outcome)
+        return FakeResponse(outcome)
+
+@pytest.fixture
+def session(monkeypatch):
+    sleeps = []
+    monkeypatch.setitem(appvar.config, "HTTP_MAX_RETRIES", 3)
+    monkeypatch.setitem(appvar.config, "HTTP_BACKOFF", 0.5)
+    monkeypatch.setitem(appvar.config, "HTTP_BACKOFF_MAX", 30)
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+
+    def use(outcomes):
+        fake = FakeSession(outcomes)
+        monkeypatch.setattr(http_client, "get_session", lambda url: fake)
+        return fake, sleeps
+    return use
+
+def test_429_waits_as_long_as_retry_after_says(session):
+    fake, sleeps = session([(429, {"Retry-After":"2"}), 200])
+
+    assert http_client.get("http://service/").status_code == 200
+    assert fake.calls == 2 and sleeps == [2.0]
+
+def test_retry_after_beyond_the_backoff_max_is_returned(session):
+    fake, sleeps = session([(429, {"Retry-After":"120"}), 200])
+
+    assert http_client.get("http://service/").status_code == 429
+    assert fake.calls == 1 and sleeps == []
+
+def test_5xx_is_retried_until_retries_run_out(session):
+    fake, sleeps = session([503] * 5)
+
+    assert http_client.get("http://service/").status_code == 503
+    assert fake.calls == 4 and len(sleeps) == 3
+    # Full jitter stays under the doubling ceiling
+    assert all(0 <= delay <= 0.5 * 2 ** attempt for attempt, delay in enumerate(sleeps))
+
+def test_connection_errors_and_timeouts_are_retried(session):
+    fake, sleeps = session([requests.ConnectionError(), requests.Timeout(), 200])
+
+    assert http_client.get("http://service/").status_code == 200
+    assert fake.calls == 3 and len(sleeps) == 2
+
+def test_connection_errors_are_raised_once_retries_run_out(session):
+    fake, sleeps = session([requests.ConnectionError()] * 5)
+
+    with pytest.raises(requests.ConnectionError):
+        http_client.get("http://service/")
+    assert fake.calls == 4
+
+def test_retry_after_as_an_http_date():
+    response = FakeResponse(429, {"Retry-After":formatdate(time.time() + 60, usegmt=True)})
+
+    assert 55 <= http_client.retry_after(response) <= 60
+    assert http_client.retry_after(FakeResponse(429, {"Retry-After":"soon"})) is None
+
+def test_retries_are_charged_against_the_quota_once(session, monkeypatch):
+    class Budget(object):
+        def __init__(self):
+            self.acquired = []
+            self.throttles = []
+        def acquire(self, chars=0):
+            self.acquired.append(chars)
+        def throttled(self, seconds):
+            self.throttles.append(seconds)
+    budget = Budget()
+    monkeypatch.setattr(http_client.quota, "for_request", lambda call, headers: budget)
+    fake, sleeps = session([503, (429, {"Retry-After":"1"}), 200])
+
+    assert http_client.post("http://service/", call="translate", chars=500).status_code == 200
+    assert fake.calls == 3
+    assert budget.acquired == [500] and budget.throttles == [1.0]
+    assert sleeps[-1] == 1.0
@@ -0,0 +1,43 @@
+import io
+import os
+import struct
+import sys
+sys.path.append(os.getcwd())
+import pytest
+Image = pytest.importorskip("PIL.Image")
+from util import image_prep
+
+def _exif(orientation):
+    # A little-endian TIFF header and one IFD holding just the Orientation
+    # tag, built by hand as Image.Exif only arrived in Pillow 6
+    entry = struct.pack("<HHIHH", image_prep.ORIENTATION_TAG, 3, 1, orientation, 0)
+    return b"Exif\x00\x00" + b"II*\x00" + struct.pack("<IH", 8, 1) + entry + struct.pack("<I", 0)
+
+def _jpeg(size, orientation=1):
+    image = Image.new("RGB", size, (200, 120, 40))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=95, exif=_exif(orientation))
+    return output.getvalue()
+
+def test_large_photos_are_turned_upright_scaled_and_made_gray():
+    # Taken sideways: stored landscape, tagged to be shown rotated a quarter turn
+    prepared = image_prep.prepare(_jpeg((4000, 3000), orientation=6), mode="Printed")
+    image = Image.open(io.BytesIO(prepared))
+
+    assert image.mode == "L"
+    assert image.size[0] < image.size[1]
+    assert max(image.size) <= image_prep.appvar.config["OCR_PREP_PRINTED_MAX_SIDE"]
+    assert image_prep.orientation(image) == 1
+
+def test_small_upright_images_and_non_images_are_sent_as_they_are():
+    small = _jpeg((400, 300))
+    assert image_prep.prepare(small) is small
+    assert image_prep.prepare(b"%PDF-1.4 not an image") == b"%PDF-1.4 not an image"
+
+def test_formats_the_service_rejects_are_converted():
+    output = io.BytesIO()
+    Image.new("RGB", (400, 300), (200, 120, 40)).save(output, format="TIFF")
+
+    prepared = image_prep.prepare(output.getvalue())
+
+    assert Image.open(io.BytesIO(prepared)).format == "JPEG"
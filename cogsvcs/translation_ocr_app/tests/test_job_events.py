@@ -0,0 +1,42 @@
+import os
+import sys
+import threading
+import time
+sys.path.append(os.getcwd())
+from util.job_events import JobEvents
+
+def test_follow_waits_for_events_until_the_last():
+    events = JobEvents()
+    events.publish("job", "status", {"status":"queued"})
+
+    def run():
+        time.sleep(0.05)
+        events.publish("job", "segments", {"done":1})
+        events.publish("job", "status", {"status":"done"}, last=True)
+
+    threading.Thread(target=run).start()
+    followed = [event for event in events.follow("job", timeout=5)]
+
+    assert followed == [
+        (1, "status", {"status":"queued"}),
+        (2, "segments", {"done":1}),
+        (3, "status", {"status":"done"}),
+    ]
+
+def test_follow_resumes_after_an_event_id_and_keeps_alive():
+    events = JobEvents()
+    events.publish("job", "status", {"status":"queued"})
+    events.publish("job", "status", {"status":"cracking"})
+
+    followed = events.follow("job", after=1, timeout=0.01)
+    assert next(followed) == (2, "status", {"status":"cracking"})
+    assert next(followed) is None
+    assert list(events.follow("unknown")) == []
+
+def test_finished_jobs_expire():
+    events = JobEvents(ttl=0)
+    events.publish("old", "status", {"status":"done"}, last=True)
+    time.sleep(0.01)
+    events.publish("new", "status", {"status":"queued"})
+
+    assert list(events.follow("old")) == []
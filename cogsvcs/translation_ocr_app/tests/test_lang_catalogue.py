@@ -0,0 +1,26 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+import time
+from app import appvar
+from util import api_calls
+from util import lang_catalogue
+
+def test_failed_refresh_backs_off(monkeypatch, tmp_path):
+    calls = []
+    def fetch_languages(etag=None):
+        calls.append(etag)
+        raise ConnectionError("service down")
+
+    monkeypatch.setattr(api_calls, "fetch_languages", fetch_languages)
+    monkeypatch.setitem(appvar.config, "LANGUAGE_CACHE_PATH", str(tmp_path / "languages.json"))
+    monkeypatch.setitem(appvar.config, "LANGUAGE_CACHE_RETRY", 60)
+    monkeypatch.setattr(lang_catalogue, "_state",
+        {"languages":None, "etag":None, "fetched":0.0, "attempted":0.0, "refreshing":False})
+
+    for _ in range(5):
+        assert lang_catalogue.languages() == lang_catalogue._STATIC
+        while lang_catalogue._state["refreshing"]:
+            time.sleep(0.01)
+
+    assert len(calls) == 1
@@ -0,0 +1,31 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+from util import langid
+
+def test_identifies_latin_script_languages():
+    assert langid.identify("Marley war tot, damit wollen wir anfangen. Ein Zweifel darüber kann nicht stattfinden.")[0] == "de"
+    assert langid.identify("Marley was dead, to begin with. There is no doubt whatever about that.")[0] == "en"
+    assert langid.identify("Marley estaba muerto, para empezar. No hay ninguna duda sobre eso.")[0] == "es"
+
+def test_identifies_by_script():
+    assert langid.identify("우선 말리는 죽었다. 그것에 대해서는 의심의 여지가 없다.")[0] == "ko"
+    assert langid.identify("まず最初に、マーリーは死んでいた。それについては何の疑いもない。")[0] == "ja"
+    assert langid.identify("首先，马利已经死了。这一点毫无疑问。")[0] == "zh-Hans"
+    assert langid.identify("首先，馬利已經死了。這一點毫無疑問。")[0] == "zh-Hant"
+
+def test_confident_on_sentences_not_on_fragments():
+    _, confident = langid.identify("Marley was dead, to begin with. There is no doubt whatever about that.")
+    _, unsure = langid.identify("Hello world")
+
+    assert confident > 0.5
+    assert unsure < 0.5
+
+def test_too_little_text():
+    assert langid.identify("") == (None, 0.0)
+    assert langid.identify("12345 ...") == (None, 0.0)
+
+def test_single_words_are_left_to_the_service():
+    # Long enough to pass the letter minimum, but a loanword fits several languages
+    assert langid.identify("Restaurant") == (None, 0.0)
+    assert langid.identify("Zusammenarbeit")[0] is None
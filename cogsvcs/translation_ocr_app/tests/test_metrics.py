@@ -0,0 +1,34 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+from util.metrics import Counter, Histogram, Gauge
+
+def test_counter_renders_labelled_samples():
+    c = Counter("calls_total", "Calls", ["call"])
+    c.inc(call="translate")
+    c.inc(2, call="translate")
+    c.inc(call="ocr")
+
+    assert c.render() == [
+        "# HELP calls_total Calls",
+        "# TYPE calls_total counter",
+        'calls_total{call="ocr"} 1',
+        'calls_total{call="translate"} 3',
+    ]
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("latency_seconds", "Latency", ["call"], buckets=(0.1, 1))
+    h.observe(0.05, call="x")
+    h.observe(0.5, call="x")
+    h.observe(5, call="x")
+
+    lines = h.render()
+    assert 'latency_seconds_bucket{call="x",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{call="x",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{call="x",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{call="x"} 3' in lines
+
+def test_gauge_callback_is_read_at_render():
+    g = Gauge("pending", "Pending", callback=lambda: {(): 4})
+
+    assert g.render()[-1] == "pending 4"
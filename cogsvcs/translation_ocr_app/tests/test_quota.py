@@ -0,0 +1,64 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+sys.path.append(os.getcwd())
+from util.quota import TokenBucket, Quota, INTERACTIVE, BULK
+
+def test_bucket_waits_for_refill_and_allows_one_oversized_take():
+    bucket = TokenBucket(rate=10, capacity=5, now=0)
+    bucket.take(5)
+    assert bucket.wait_for(1) == 0.1
+    bucket.refill(0.5)
+    assert bucket.wait_for(1) == 0
+    # More than the capacity only has to wait for a full bucket, then goes into debt
+    assert bucket.wait_for(50) == 0
+    bucket.take(50)
+    assert abs(bucket.wait_for(1) - 4.6) < 1e-9
+
+def test_calls_are_paced_to_the_rate():
+    quota = Quota("test", calls_per_second=50, burst_seconds=0)
+    start = time.time()
+    for _ in range(11):
+        quota.acquire()
+    assert 0.18 < time.time() - start < 0.5
+
+def test_interactive_callers_go_before_queued_bulk():
+    quota = Quota("test", calls_per_second=20, burst_seconds=0)
+    quota.acquire()
+    order = []
+
+    def call(priority, name):
+        quota.acquire(priority=priority)
+        order.append(name)
+
+    threads = [threading.Thread(target=call, args=(BULK, "bulk{}".format(i))) for i in range(3)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.005)
+    assert quota.waiting()[BULK] == 3
+    threads.append(threading.Thread(target=call, args=(INTERACTIVE, "interactive")))
+    threads[-1].start()
+    for thread in threads:
+        thread.join()
+
+    assert order.index("interactive") <= 1
+    assert quota.waiting() == {INTERACTIVE:0, BULK:0}
+
+def test_characters_and_throttling_hold_back_coroutines():
+    quota = Quota("test", chars_per_minute=6000, burst_seconds=1)
+
+    async def main():
+        start = time.time()
+        await asyncio.gather(*[quota.acquire_async(chars=50) for _ in range(4)])
+        return time.time() - start
+
+    # 100 characters of burst, then 100 a second
+    assert 0.9 < asyncio.run(main()) < 1.5
+
+    quota = Quota("test", calls_per_second=100)
+    quota.throttled(0.3)
+    start = time.time()
+    quota.acquire()
+    assert time.time() - start > 0.25
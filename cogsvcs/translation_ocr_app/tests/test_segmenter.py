@@ -0,0 +1,43 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+from util import segmenter
+
+def test_segment_round_trips_layout():
+    text = "  First paragraph. Still first.\n\nSecond one!\n \n\nThird.\n"
+    head, segments = segmenter.segment(text, max_chars=100)
+
+    assert [t for t, _ in segments] == ["First paragraph. Still first.", "Second one!", "Third."]
+    assert segmenter.join(head, segments, [t for t, _ in segments]) == text
+
+def test_segment_splits_long_paragraph_on_sentences():
+    text = "One two three. Four five six. Seven eight nine."
+    head, segments = segmenter.segment(text, max_chars=30)
+
+    assert [t for t, _ in segments] == ["One two three. Four five six.", "Seven eight nine."]
+    assert all(len(t) <= 30 for t, _ in segments)
+    assert segmenter.join(head, segments, [t for t, _ in segments]) == text
+
+def test_segment_by_sentence():
+    text = "One two three. Four five six!\n\n你好。再见。"
+    head, segments = segmenter.segment(text, max_chars=100, sentences=True)
+
+    assert [t for t, _ in segments] == ["One two three.", "Four five six!", "你好。", "再见。"]
+    assert segmenter.join(head, segments, [t for t, _ in segments]) == text
+
+def test_segment_hard_cuts_unbroken_text():
+    text = "x" * 25
+    head, segments = segmenter.segment(text, max_chars=10)
+
+    assert [len(t) for t, _ in segments] == [10, 10, 5]
+    assert segmenter.join(head, segments, [t for t, _ in segments]) == text
+
+def test_segment_empty():
+    assert segmenter.segment(None) == ("", [])
+    assert segmenter.segment("   ") == ("   ", [])
+
+def test_pack_respects_limits():
+    texts = ["a" * 4, "b" * 4, "c" * 4, "d", "e", "f"]
+
+    assert segmenter.pack(texts, max_elements=10, max_chars=8) == [[0, 1], [2, 3, 4, 5]]
+    assert segmenter.pack(texts, max_elements=2, max_chars=100) == [[0, 1], [2, 3], [4, 5]]
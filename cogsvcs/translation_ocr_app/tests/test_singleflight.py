@@ -0,0 +1,62 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+sys.path.append(os.getcwd())
+from util.singleflight import SingleFlight, AsyncSingleFlight
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight("test")
+    calls = []
+    release = threading.Event()
+
+    def slow(value):
+        calls.append(value)
+        release.wait(5)
+        return value * 2
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow, 21))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while not calls:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [21]
+    assert results == [42] * 5
+    assert flight.in_flight() == 0
+
+def test_exceptions_reach_every_caller():
+    flight = SingleFlight("test")
+
+    def fail():
+        raise ValueError("boom")
+
+    for _ in range(2):
+        try:
+            flight.do("k", fail)
+            assert False
+        except ValueError as e:
+            assert str(e) == "boom"
+    assert flight.in_flight() == 0
+
+def test_async_callers_share_one_call():
+    flight = AsyncSingleFlight("test")
+    calls = []
+
+    async def slow(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return value * 2
+
+    async def main():
+        return await asyncio.gather(*[flight.do("k", slow, 21) for _ in range(5)])
+
+    assert asyncio.run(main()) == [42] * 5
+    assert calls == [21]
+    assert flight.in_flight() == 0
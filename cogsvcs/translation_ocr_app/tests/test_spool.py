@@ -0,0 +1,57 @@
+import io
+import os
+import sys
+sys.path.append(os.getcwd())
+import pytest
+from util.spool import Spool, SpoolFullError
+
+def test_small_upload_stays_in_memory(tmp_path):
+    spool = Spool(directory=str(tmp_path), memory_max=1024, quota=4096)
+
+    with spool.open(io.BytesIO(b"x" * 100)) as document:
+        assert isinstance(document, io.BytesIO)
+        assert document.read() == b"x" * 100
+    assert os.listdir(str(tmp_path)) == []
+
+def test_large_upload_is_spooled_and_removed(tmp_path):
+    spool = Spool(directory=str(tmp_path), memory_max=1024, quota=1024*1024)
+    content = os.urandom(200 * 1024)
+
+    with spool.open(io.BytesIO(content)) as document:
+        assert os.path.dirname(document.name) == str(tmp_path)
+        assert document.read() == content
+        assert spool.used() == len(content)
+    assert os.listdir(str(tmp_path)) == []
+    assert spool.used() == 0
+
+def test_quota_is_enforced_and_released(tmp_path):
+    spool = Spool(directory=str(tmp_path), memory_max=1024, quota=100*1024)
+
+    with pytest.raises(SpoolFullError):
+        with spool.open(io.BytesIO(b"x" * 200 * 1024)):
+            pass
+    assert os.listdir(str(tmp_path)) == []
+    assert spool.used() == 0
+
+def test_stale_spool_files_are_removed(tmp_path):
+    stale = tmp_path / "translation-spool-old"
+    stale.write_bytes(b"x")
+    os.utime(str(stale), (0, 0))
+    other = tmp_path / "keep.txt"
+    other.write_bytes(b"x")
+
+    Spool(directory=str(tmp_path))
+
+    assert os.listdir(str(tmp_path)) == ["keep.txt"]
+
+def test_uploads_go_to_disk_once_memory_is_taken(tmp_path):
+    spool = Spool(directory=str(tmp_path), memory_max=100*1024, quota=1024*1024, memory_quota=150*1024)
+
+    with spool.open(io.BytesIO(b"x" * 80 * 1024)) as first:
+        assert isinstance(first, io.BytesIO)
+        assert spool.memory_used() == 80 * 1024
+        with spool.open(io.BytesIO(b"y" * 80 * 1024)) as second:
+            assert not isinstance(second, io.BytesIO)
+            assert second.read() == b"y" * 80 * 1024
+            assert spool.memory_used() == 80 * 1024 and spool.used() == 80 * 1024
+    assert spool.memory_used() == 0 and spool.used() == 0
@@ -0,0 +1,43 @@
+import hashlib
+import io
+import os
+import sys
+sys.path.append(os.getcwd())
+from util import storage
+
+def test_blob_names_follow_content_not_filename():
+    content = b"the same image"
+    digest = storage.content_digest(io.BytesIO(content))
+
+    assert digest == hashlib.sha256(content).hexdigest()
+
+def test_same_content_is_stored_once_whatever_its_name(monkeypatch):
+    uploads = []
+    monkeypatch.setattr(storage, "blob_exists", lambda blob_name: blob_name in [name for name, _ in uploads])
+    monkeypatch.setattr(storage, "upload_stream", lambda stream, blob_name, content_type=None: uploads.append((blob_name, content_type)))
+    content = b"the same image"
+    digest = hashlib.sha256(content).hexdigest()
+
+    names = [storage.save_bytes(content, filename) for filename in ("Scan 1.JPG", "x.jpeg", "api-upload")]
+
+    assert names == [digest] * 3
+    assert uploads == [(digest, "image/jpeg")]
+
+def test_content_type_comes_from_the_upload_or_its_name():
+    assert storage.content_type_for("scan.png", "image/png") == "image/png"
+    assert storage.content_type_for("scan.png", "application/octet-stream") == "image/png"
+    assert storage.content_type_for("api-upload", None) is None
+
+def test_digest_leaves_the_stream_ready_to_upload():
+    stream = io.BytesIO(os.urandom(1000))
+    storage.content_digest(stream)
+    assert stream.tell() == 0
+
+def test_failed_background_archives_are_counted(monkeypatch):
+    def save_bytes(content, filename, content_type=None):
+        raise OSError("storage unreachable")
+    monkeypatch.setattr(storage, "save_bytes", save_bytes)
+    before = storage.ARCHIVE_FAILURES._values.get((), 0)
+
+    assert storage.save_bytes_async(b"image", "scan.jpg", "image/jpeg").result() is None
+    assert storage.ARCHIVE_FAILURES._values.get((), 0) == before + 1
@@ -0,0 +1,98 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+import translate_folder
+from util import quota
+
+def _translated(source_path, from_lang, to_langs, mode):
+    with open(source_path, encoding="utf-8") as f:
+        original = f.read()
+    results = {to_lang: {"content":original.upper(), "language":{"language":"de", "score":1.0}} for to_lang in to_langs}
+    return original, results, "pdfminer"
+
+def _folder(tmp_path, *names):
+    source = tmp_path / "scans"
+    source.mkdir()
+    for name in names:
+        (source / name).write_text("Hallo " + name, encoding="utf-8")
+    return str(source), str(tmp_path / "scans-translated")
+
+def test_files_are_translated_at_bulk_priority(tmp_path, monkeypatch):
+    priorities = []
+    def translate_file(source_path, from_lang, to_langs, mode):
+        priorities.append(quota.current_priority())
+        return _translated(source_path, from_lang, to_langs, mode)
+    monkeypatch.setattr(translate_folder, "translate_file", translate_file)
+    source, output = _folder(tmp_path, "a.pdf", "b.pdf")
+
+    translate_folder.run(source, output, "de", ["en"], "Printed", workers=2)
+
+    assert priorities == [quota.BULK] * 2
+    assert quota.current_priority() == quota.INTERACTIVE
+
+def _manifest(output):
+    return translate_folder.load_manifest(os.path.join(output, translate_folder.MANIFEST))
+
+def test_a_manifest_line_cut_short_is_ignored(tmp_path):
+    path = tmp_path / "manifest.jsonl"
+    path.write_text('{"path":"a.pdf","status":"failed"}\n{"path":"a.pdf","status":"done"}\n{"path":"b.pdf","sta',
+        encoding="utf-8")
+
+    assert translate_folder.load_manifest(str(path)) == {"a.pdf":{"path":"a.pdf", "status":"done"}}
+
+def test_files_are_redone_when_they_or_the_languages_change(tmp_path, monkeypatch):
+    monkeypatch.setattr(translate_folder, "translate_file", _translated)
+    source, output = _folder(tmp_path, "a.pdf")
+    source_path = os.path.join(source, "a.pdf")
+    translate_folder.run(source, output, "de", ["en", "fr"], "Printed", workers=1)
+    entry = _manifest(output)["a.pdf"]
+
+    assert translate_folder.is_done(entry, source_path, ["en", "fr"])
+    assert translate_folder.is_done(entry, source_path, ["fr"])
+    assert not translate_folder.is_done(entry, source_path, ["en", "es"])
+    assert not translate_folder.is_done(None, source_path, ["en"])
+    assert not translate_folder.is_done(dict(entry, status="failed"), source_path, ["en"])
+
+    stat = os.stat(source_path)
+    os.utime(source_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert not translate_folder.is_done(entry, source_path, ["en"])
+    with open(source_path, "a", encoding="utf-8") as f:
+        f.write(" und mehr")
+    # Same modification time, different size
+    same_mtime = dict(entry, mtime=translate_folder.fingerprint(source_path)["mtime"])
+    assert not translate_folder.is_done(same_mtime, source_path, ["en"])
+    assert translate_folder.is_done(dict(same_mtime, size=os.path.getsize(source_path)), source_path, ["en"])
+
+def test_a_second_run_skips_what_is_done_and_retries_failures(tmp_path, monkeypatch):
+    def translate_file(source_path, from_lang, to_langs, mode):
+        if source_path.endswith("b.pdf"):
+            raise ConnectionError("Connection refused")
+        return _translated(source_path, from_lang, to_langs, mode)
+    monkeypatch.setattr(translate_folder, "translate_file", translate_file)
+    source, output = _folder(tmp_path, "a.pdf", "b.pdf")
+
+    assert translate_folder.run(source, output, "de", ["en"], "Printed", workers=1) == {"done":1, "failed":1, "skipped":0}
+    with open(os.path.join(output, "a.pdf.en.txt"), encoding="utf-8") as f:
+        assert f.read() == "HALLO A.PDF"
+    assert _manifest(output)["b.pdf"]["error"] == "Connection refused"
+
+    assert translate_folder.run(source, output, "de", ["en"], "Printed", workers=1, retry_failed=False) == \
+        {"done":0, "failed":0, "skipped":2}
+
+    monkeypatch.setattr(translate_folder, "translate_file", _translated)
+    assert translate_folder.run(source, output, "de", ["en"], "Printed", workers=1) == {"done":1, "failed":0, "skipped":1}
+    assert _manifest(output)["b.pdf"]["status"] == "done"
+
+def test_a_run_after_an_interrupted_write_starts_on_a_new_line(tmp_path, monkeypatch):
+    monkeypatch.setattr(translate_folder, "translate_file", _translated)
+    source, output = _folder(tmp_path, "a.pdf")
+    os.makedirs(output)
+    with open(os.path.join(output, translate_folder.MANIFEST), "w", encoding="utf-8") as f:
+        f.write('{"path":"a.pdf","sta')
+
+    translate_folder.run(source, output, "de", ["en"], "Printed", workers=1)
+
+    with open(os.path.join(output, translate_folder.MANIFEST), encoding="utf-8") as f:
+        lines = f.read().split("\n")
+    assert lines[0] == '{"path":"a.pdf","sta' and lines[-1] == ""
+    assert _manifest(output)["a.pdf"]["status"] == "done"
@@ -0,0 +1,55 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+import asyncio
+import pytest
+from app import appvar
+from util import api_calls
+
+TEXTS = ["Hallo", "boom", "Welt"]
+
+def _translate_batch(texts, from_lang, to_lang):
+    if "boom" in texts:
+        raise ConnectionError("Connection refused")
+    return [{"content":text.upper(), "language":{"language":"de", "score":1.0}} for text in texts]
+
+def _check(results):
+    assert sorted(results) == [0, 1, 2]
+    assert results[0]["content"] == "HALLO" and results[2]["content"] == "WELT"
+    assert results[1]["language"]["language"] == "Error"
+    assert "Connection refused" in results[1]["content"]
+
+def test_a_failed_batch_is_reported_for_its_texts(monkeypatch):
+    monkeypatch.setitem(appvar.config, "TRANSLATE_MAX_ELEMENTS", 1)
+    monkeypatch.setattr(api_calls, "translate_batch", _translate_batch)
+
+    _check(dict(api_calls.translate_many(TEXTS, "de", "en")))
+
+def test_a_failed_batch_is_reported_for_its_texts_async(monkeypatch):
+    async_api_calls = pytest.importorskip("util.async_api_calls")
+    monkeypatch.setitem(appvar.config, "TRANSLATE_MAX_ELEMENTS", 1)
+
+    async def translate_batch(texts, from_lang, to_lang):
+        return _translate_batch(texts, from_lang, to_lang)
+    monkeypatch.setattr(async_api_calls, "translate_batch", translate_batch)
+
+    async def collect():
+        return {index: result async for index, result in async_api_calls.translate_many(TEXTS, "de", "en")}
+    _check(asyncio.run(collect()))
+
+def test_a_short_answer_from_the_service_fails_the_whole_batch():
+    body = [{"translations":[{"text":"Hello", "to":"en"}]}]
+
+    results = api_calls._translate_results(200, body, ["Hallo", "Welt"], "de", ["en"])
+
+    assert len(results["en"]) == 2
+    assert all(result["language"]["language"] == "Error" for result in results["en"])
+
+def test_bulk_work_has_its_own_pool():
+    from util import quota
+    interactive = api_calls.translate_pool()
+    with quota.bulk():
+        bulk = api_calls.translate_pool()
+
+    assert bulk is not interactive
+    assert bulk._max_workers == appvar.config["TRANSLATE_BULK_WORKERS"]
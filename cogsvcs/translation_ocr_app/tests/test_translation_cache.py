@@ -0,0 +1,40 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+from util.translation_cache import TwoTierCache, MemoryCache, make_key
+
+def test_make_key_depends_on_languages_and_version():
+    key = make_key("translate", "Hello", None, "de", "3.0")
+
+    assert key == make_key("translate", "Hello", None, "de", "3.0")
+    assert key != make_key("translate", "Hello", "en", "de", "3.0")
+    assert key != make_key("translate", "Hello", None, "fr", "3.0")
+    assert key != make_key("translate", "Hello", None, "de", "3.1")
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+def test_memory_cache_expires():
+    cache = MemoryCache(max_size=2, ttl=-1)
+    cache.set("a", 1)
+
+    assert cache.get("a") is None
+
+def test_two_tier_cache_promotes_disk_hits(tmpdir):
+    path = str(tmpdir.join("cache.db"))
+    first = TwoTierCache(path, memory_size=10)
+    first.set("k", {"content":"Hallo"})
+
+    second = TwoTierCache(path, memory_size=10)
+    assert second.get("missing") is None
+    assert second.get("k") == {"content":"Hallo"}
+    assert second.get("k") == {"content":"Hallo"}
+    assert second.stats() == {"memory_hits":1, "disk_hits":1, "misses":1, "memory_entries":1}
@@ -0,0 +1,19 @@
+import os
+import sys
+sys.path.append(os.getcwd())
+from util.translation_memory import TranslationMemory, normalize
+
+def result(text, language="de"):
+    return {"content":text, "language": {"language":language, "score":1.0}}
+
+def test_normalize_collapses_whitespace():
+    assert normalize("  Hallo\n  Welt.\t") == "Hallo Welt."
+
+def test_lookup_matches_normalized_segments_per_pair(tmpdir):
+    memory = TranslationMemory(str(tmpdir.join("tm.db")))
+    memory.store("de", "en", ["Hallo Welt.", "Kaputt."], [result("Hello world."), result("Error", "Error")])
+
+    found = memory.lookup("de", "en", ["Neu.", "Hallo\nWelt.", "Kaputt."])
+    assert found == {1: result("Hello world.")}
+    assert memory.lookup("de", "fr", ["Hallo Welt."]) == {}
+    assert memory.stats() == {"hits":1, "misses":3, "chars_saved":len("Hallo\nWelt.")}
@@ -0,0 +1,195 @@
+"""
+Translate every PDF and image under a folder, for backlogs too big for the
+upload form:
+
+    python translate_folder.py D:\\backlog --to de --to fr
+
+Documents are cracked (and scanned pages recognized) or, for images, OCR'd
+the same way the app does it, several files at a time. Each file's text and
+translations are written under the output folder (the source folder's name
+with "-translated" by default) as <name>.txt and <name>.<lang>.txt, and a
+line is added to manifest.jsonl there once they are written. Running the
+same command again skips files the manifest says are done and unchanged,
+so an interrupted run picks up where it stopped.
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from app import appvar
+from app.routes import crack_pdf, ocr_translate_job
+from util import api_calls
+from util import quota
+
+PDF_EXTENSIONS = (".pdf",)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tif", ".tiff")
+MANIFEST = "manifest.jsonl"
+
+
+def find_documents(source):
+    """Paths relative to source of every PDF and image under it, in a stable order"""
+    for directory, dirnames, filenames in os.walk(source):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(PDF_EXTENSIONS + IMAGE_EXTENSIONS):
+                yield os.path.relpath(os.path.join(directory, filename), source)
+
+
+def load_manifest(path):
+    """The latest entry for each file; a line cut short by an interruption is ignored"""
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries[entry["path"]] = entry
+    return entries
+
+
+def fingerprint(path):
+    stat = os.stat(path)
+    return {"size":stat.st_size, "mtime":stat.st_mtime_ns}
+
+
+def is_done(entry, source_path, to_langs):
+    return entry is not None and entry["status"] == "done" \
+        and set(to_langs) <= set(entry["to_langs"]) \
+        and {"size":entry["size"], "mtime":entry["mtime"]} == fingerprint(source_path)
+
+
+def translate_file(source_path, from_lang, to_langs, mode):
+    """(original text, {to_lang: result}, how the text was extracted)"""
+    if source_path.lower().endswith(PDF_EXTENSIONS):
+        with open(source_path, "rb") as document:
+            cracked, warning = crack_pdf(document)
+        if warning:
+            print("{}: {}".format(source_path, warning))
+        original = cracked["content"]
+        if from_lang is None:
+            from_lang = api_calls.guess_language(original)
+        return original, api_calls.translate_document_multi(original, from_lang, to_langs), cracked["engine"]
+
+    with open(source_path, "rb") as f:
+        image = f.read()
+    ocr_from_lang = from_lang or "unk"
+    result = ocr_translate_job(image, ocr_from_lang, mode, from_lang, to_langs)
+    return result["original"], {item["to"]: item for item in result["results"]}, "ocr"
+
+
+def _write(path, text):
+    # Written aside and moved into place, so an interruption never leaves half a file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".part", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(path + ".part", path)
+
+
+def process(source, output, relpath, from_lang, to_langs, mode):
+    """Translate one file and write its outputs; returns its manifest entry"""
+    source_path = os.path.join(source, relpath)
+    entry = dict(fingerprint(source_path), path=relpath, to_langs=to_langs)
+    start = time.time()
+    try:
+        original, results, engine = translate_file(source_path, from_lang, to_langs, mode)
+        errors = [result["content"] for result in results.values() if result["language"]["language"] == "Error"]
+        if errors:
+            raise RuntimeError(errors[0])
+
+        outputs = {"original":relpath + ".txt"}
+        _write(os.path.join(output, outputs["original"]), original)
+        for to_lang in to_langs:
+            outputs[to_lang] = "{}.{}.txt".format(relpath, to_lang)
+            _write(os.path.join(output, outputs[to_lang]), results[to_lang]["content"])
+        entry.update(status="done", engine=engine, characters=len(original), outputs=outputs,
+            from_lang=results[to_langs[0]]["language"]["language"] if original else from_lang)
+    except Exception as e:
+        entry.update(status="failed", error=str(e) or e.__class__.__name__)
+    entry["seconds"] = round(time.time() - start, 3)
+    return entry
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def run(source, output, from_lang, to_langs, mode, workers, retry_failed=True):
+    manifest_path = os.path.join(output, MANIFEST)
+    os.makedirs(output, exist_ok=True)
+    previous = load_manifest(manifest_path)
+    counts = {"done":0, "failed":0, "skipped":0}
+    start = time.time()
+
+    # A backlog gives way to people using the app, and uses the bulk translation pool
+    with quota.bulk(), open(manifest_path, "a", encoding="utf-8") as manifest, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        if manifest.tell() > 0 and not _ends_with_newline(manifest_path):
+            # Start after the half-written line of an interrupted run rather than on the end of it
+            manifest.write("\n")
+
+        def record(future):
+            entry = future.result()
+            manifest.write(json.dumps(entry) + "\n")
+            manifest.flush()
+            counts[entry["status"]] += 1
+            print("{:<7} {} ({}s){}".format(entry["status"], entry["path"], entry["seconds"],
+                ": " + entry["error"] if "error" in entry else ""))
+
+        in_flight = set()
+        try:
+            for relpath in find_documents(source):
+                entry = previous.get(relpath)
+                if is_done(entry, os.path.join(source, relpath), to_langs) or \
+                        (not retry_failed and entry is not None and entry["status"] == "failed"):
+                    counts["skipped"] += 1
+                    continue
+                # Only a few files are queued at a time, so a huge folder isn't all listed up front
+                in_flight.add(pool.submit(quota.carry(process), source, output, relpath, from_lang, to_langs, mode))
+                if len(in_flight) >= workers * 2:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        record(future)
+            for future in wait(in_flight).done:
+                record(future)
+        except KeyboardInterrupt:
+            for future in in_flight:
+                future.cancel()
+            print("Interrupted; waiting for the files being translated to finish")
+            # Their outputs get written either way, so record them or the next run redoes them
+            for future in wait(in_flight).done:
+                if not future.cancelled():
+                    record(future)
+            print("Run again to carry on")
+            raise
+
+    print("{done} done, {failed} failed, {skipped} skipped in {:.0f}s".format(time.time() - start, **counts))
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argparser = argparse.ArgumentParser(description="Translate every PDF and image in a folder")
+    argparser.add_argument("source", help="Folder to translate, including its subfolders")
+    argparser.add_argument("-o", "--output", help="Folder for translations and the manifest (default: <source>-translated)")
+    argparser.add_argument("-t", "--to", dest="to_langs", action="append", required=True,
+        help="Language to translate into; repeat for more")
+    argparser.add_argument("-f", "--from", dest="from_lang", help="Source language (default: identify it per file)")
+    argparser.add_argument("-m", "--mode", choices=["Printed", "Handwritten"], default="Printed", help="OCR mode for images")
+    argparser.add_argument("-w", "--workers", type=int, default=appvar.config["PDF_JOB_WORKERS"], help="Files translated at once")
+    argparser.add_argument("--skip-failed", action="store_true", help="Don't retry files that failed on an earlier run")
+    args = argparser.parse_args()
+
+    source = os.path.abspath(args.source)
+    output = os.path.abspath(args.output or source.rstrip(os.sep) + "-translated")
+    try:
+        counts = run(source, output, args.from_lang, args.to_langs, args.mode, args.workers, not args.skip_failed)
+    except KeyboardInterrupt:
+        raise SystemExit(130)
+    raise SystemExit(1 if counts["failed"] else 0)
@@ -1,10 +1,32 @@
-import requests
 from app import appvar
+from util import http_client
+from util import langid
+from util import segmenter
+from util import translation_cache
+from util import translation_memory
+from util import metrics
+from util import quota
+from util import singleflight
+import hashlib
 import json
 import uuid
 import urllib.parse as urlparse
 from urllib.parse import urlencode
 import time
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+API_VERSION = '3.0'
+# The Vision version VISION_URL points at; part of the OCR cache keys
+OCR_API_VERSION = 'v2.0'
+
+TRANSLATED_CHARACTERS = metrics.counter("translation_app_translated_characters_total",
+    "Characters sent to the Translator service, counted once per target language")
+
+LANGUAGE_GUESSES = metrics.counter("translation_app_language_guesses_total",
+    "Source languages identified locally or left to the service", ["source"])
 
 PATH_LOOKUP = {
     "detect":'/detect',
@@ -37,100 +59,538 @@ def headers(subscription_key):
         'X-ClientTraceId': str(uuid.uuid4())
     }
 
-def translate_text(contents, from_lang, to_lang):
-    header = headers(appvar.config["COGS_KEY"])
-    contents_json = [{"Text":contents}]
-    detected_dict = {"language":from_lang, "score":1.0}
+def error_result(message):
+    return {"content":message, "language": {"language":"Error", "score":0.0}}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def result_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = translation_cache.TwoTierCache(
+                path = appvar.config["TRANSLATION_CACHE_PATH"],
+                memory_size = appvar.config["TRANSLATION_CACHE_MEMORY_SIZE"],
+                max_entries = appvar.config["TRANSLATION_CACHE_MAX_ENTRIES"],
+                ttl = appvar.config["TRANSLATION_CACHE_TTL"]
+            )
+    return _cache
+
+def _cache_lookups():
+    if _cache is None:
+        return {}
+    stats = _cache.stats()
+    return {("memory_hit",):stats["memory_hits"], ("disk_hit",):stats["disk_hits"], ("miss",):stats["misses"]}
+
+metrics.gauge("translation_app_cache_lookups_total", "Translation result cache lookups",
+    ["result"], callback=_cache_lookups, kind="counter")
+
+def translate_batch(texts, from_lang, to_lang):
+    """
+    Translate a list of texts in a single call to the service.
+    Returns one result per text in the same shape as translate_text.
+    Texts that are already cached are not sent.
+    """
+    return translate_batch_multi(texts, from_lang, [to_lang])[to_lang]
+
+def translate_batch_multi(texts, from_lang, to_langs):
+    """
+    Translate a list of texts into every language in to_langs with a single
+    call to the service. Returns {to_lang: [one result per text]}.
+    Only texts and languages missing from the cache are requested.
+    """
+    keys, results, missing, targets = _cached_translations(texts, from_lang, to_langs)
+    if missing:
+        request_texts = [texts[i] for i in missing]
+        # Identical requests already on their way to the service are shared
+        fetched = _translate_flight.do(translate_flight_key(request_texts, from_lang, targets),
+            _translate_request, request_texts, from_lang, targets)
+        _fill_translations(keys, results, missing, targets, fetched)
+
+    return results
+
+_translate_flight = singleflight.SingleFlight("translate")
+
+def translate_flight_key(texts, from_lang, to_langs):
+    """Requests whose texts differ only in whitespace get the same answer"""
+    return (tuple(translation_memory.normalize(text) for text in texts), from_lang, tuple(to_langs))
 
+def _cached_translations(texts, from_lang, to_langs):
+    """
+    Look up every (text, to_lang) in the cache. Returns the cache keys, the
+    results so far (None where missing), the indexes of the texts to request
+    and the languages to request them in.
+    """
+    cache = result_cache()
+    keys = {}
+    results = {}
+    for to_lang in to_langs:
+        results[to_lang] = []
+        for i, text in enumerate(texts):
+            keys[(to_lang, i)] = translation_cache.make_key("translate", text, from_lang, to_lang, API_VERSION)
+            results[to_lang].append(cache.get(keys[(to_lang, i)]))
+
+    missing = [i for i in range(len(texts)) if any(results[to_lang][i] is None for to_lang in to_langs)]
+    targets = [to_lang for to_lang in to_langs if any(results[to_lang][i] is None for i in missing)]
+    return keys, results, missing, targets
+
+def _fill_translations(keys, results, missing, targets, fetched):
+    cache = result_cache()
+    for to_lang in targets:
+        for i, result in zip(missing, fetched[to_lang]):
+            results[to_lang][i] = result
+            if result["language"]["language"] != "Error":
+                cache.set(keys[(to_lang, i)], result)
+
+def _translate_url(from_lang, to_langs):
     base_url = appvar.config["LANGUAGE_URL"]+PATH_LOOKUP["translate"]
-    params = {"api-version":'3.0', "to":to_lang}
+    params = {"api-version":API_VERSION, "to":to_langs}
     if from_lang is not None:
         params.update({"from":from_lang})
 
-    service_url = "{}?{}".format(base_url,urlencode(params))
+    return "{}?{}".format(base_url,urlencode(params, doseq=True))
 
-    req = requests.post(
-        url = service_url,
+def billed_characters(texts, to_langs):
+    """Translator counts every character once per target language"""
+    return sum(len(text) for text in texts) * len(to_langs)
+
+def _translate_request(texts, from_lang, to_langs):
+    header = headers(appvar.config["COGS_KEY"])
+    contents_json = [{"Text":text} for text in texts]
+
+    req = http_client.post(
+        call = "translate",
+        url = _translate_url(from_lang, to_langs),
         headers = header, 
-        data = json.dumps(contents_json)
+        data = json.dumps(contents_json),
+        chars = billed_characters(texts, to_langs)
     )
-    
-    results = ""
+
     try:
-        if req.status_code == 200:
-            # If the language was guessed, reach into the response and get the language and score
-            if from_lang is None:
-                detected_dict = req.json()[0]["detectedLanguage"]
+        body = req.json()
+    except ValueError:
+        body = None
+    return _translate_results(req.status_code, body, texts, from_lang, to_langs)
 
-            results = {"content":req.json()[0]["translations"][0]["text"], "language":detected_dict}
+def _translate_results(status_code, body, texts, from_lang, to_langs):
+    """Turn the service's response into {to_lang: [one result per text]}"""
+    detected_dict = {"language":from_lang, "score":1.0}
+    results = {to_lang: [] for to_lang in to_langs}
+    try:
+        if status_code == 200:
+            if len(body) != len(texts) or any(len(item["translations"]) != len(to_langs) for item in body):
+                # Results are matched to texts by position, so a short answer can't be used at all
+                error = error_result("The service returned {} results for {} texts. Please contact your administrator.".format(
+                    len(body), len(texts)))
+                print(body)
+                return {to_lang: [error] * len(texts) for to_lang in to_langs}
+            TRANSLATED_CHARACTERS.inc(sum(len(text) for text in texts) * len(to_langs))
+            for item in body:
+                # If the language was guessed, reach into the response and get the language and score
+                if from_lang is None:
+                    detected_dict = item["detectedLanguage"]
+
+                # The service answers with one translation per target, in request order
+                for to_lang, translation in zip(to_langs, item["translations"]):
+                    results[to_lang].append({"content":translation["text"], "language":detected_dict})
         else:
             # Try to get the error message
-            results = {"content":"Error Code:{} | {} | Please contact your administrator.".format(req.json()["error"]["code"],req.json()["error"]["message"]),
-                "language": {"language":"Error", "score":0.0}
-                }
-    except (KeyError, IndexError):
-        results = {"content":"There was an error during processing. ({})".format(req.status_code),
-            "language": {"language":"Error", "score":0.0}
-            }
-        print(req.json())
+            error = error_result("Error Code:{} | {} | Please contact your administrator.".format(body["error"]["code"],body["error"]["message"]))
+            results = {to_lang: [error] * len(texts) for to_lang in to_langs}
+    except (KeyError, IndexError, TypeError):
+        error = error_result("There was an error during processing. ({})".format(status_code))
+        results = {to_lang: [error] * len(texts) for to_lang in to_langs}
+        print(body)
 
     return results
 
+def translate_text(contents, from_lang, to_lang):
+    return translate_batch([contents], from_lang, to_lang)[0]
+
+_translate_pools = {}
+_translate_pool_lock = threading.Lock()
+
+def translate_pool():
+    """
+    The pool for the caller's translation requests. Bulk work (see
+    quota.bulk) has a pool of its own, so its queued batches never hold up
+    interactive ones on their way to the quota, where interactive calls go
+    first.
+    """
+    priority = quota.current_priority()
+    with _translate_pool_lock:
+        if priority not in _translate_pools:
+            workers = appvar.config["TRANSLATE_BULK_WORKERS" if priority == quota.BULK else "TRANSLATE_WORKERS"]
+            _translate_pools[priority] = ThreadPoolExecutor(max_workers=workers)
+        return _translate_pools[priority]
+
+_memory = None
+_memory_lock = threading.Lock()
+
+def memory_store():
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = translation_memory.TranslationMemory(appvar.config["TRANSLATION_MEMORY_PATH"])
+    return _memory
+
+def _memory_lookups():
+    if _memory is None:
+        return {}
+    stats = _memory.stats()
+    return {("hit",):stats["hits"], ("miss",):stats["misses"]}
+
+metrics.gauge("translation_app_memory_segments_total", "Translation memory segment lookups",
+    ["result"], callback=_memory_lookups, kind="counter")
+
+def translate_document(contents, from_lang, to_lang):
+    return translate_document_multi(contents, from_lang, [to_lang])[to_lang]
+
+def translate_document_multi(contents, from_lang, to_langs, progress=None):
+    """
+    Translate a document of any length into every language in to_langs.
+    The text is split into sentences, and sentences already in the
+    translation memory are reused. The rest are packed into requests that
+    respect the service limits and sent concurrently, each request asking
+    for all the target languages at once, before every segment is stitched
+    back together in its original order. Returns {to_lang: result}.
+
+    progress, if given, is called as soon as each request comes back (and
+    once up front for the segments found in memory) with those segments,
+    as (index, text, tail, {to_lang: result}), the number of segments
+    translated so far and the total.
+    """
+    plan = _plan_document(contents, from_lang, to_langs)
+    texts = plan["texts"]
+    if not texts:
+        return _finish_document(plan, from_lang, to_langs)
+
+    futures = {
+        translate_pool().submit(quota.carry(translate_batch_multi), [texts[i] for i in batch], from_lang, to_langs): batch
+        for batch in plan["batches"]
+    }
+
+    done = len(texts) - len(plan["missing"])
+    if progress is not None:
+        remembered = set(range(len(texts))) - set(plan["missing"])
+        progress(_progress_segments(plan["segments"], plan["translated"], sorted(remembered)), done, len(texts))
+
+    for future in as_completed(futures):
+        batch = futures[future]
+        _fill_document(plan, batch, future.result())
+        done += len(batch)
+        if progress is not None:
+            progress(_progress_segments(plan["segments"], plan["translated"], batch), done, len(texts))
+
+    return _finish_document(plan, from_lang, to_langs)
+
+def _plan_document(contents, from_lang, to_langs):
+    """
+    Split a document into sentence segments and look them up in the
+    translation memory. Returns the head, segments and their texts, the
+    results so far ({to_lang: [result or None]}), the indexes still missing
+    and those packed into batches.
+    """
+    # The service counts every target language against the character limit
+    max_chars = max(1, appvar.config["TRANSLATE_MAX_CHARS"] // len(to_langs))
+    head, segments = segmenter.segment(contents, max_chars, sentences=True)
+    texts = [text for text, _ in segments]
+
+    translated = {}
+    for to_lang in to_langs:
+        translated[to_lang] = [None] * len(texts)
+        if texts:
+            for index, result in memory_store().lookup(from_lang, to_lang, texts).items():
+                translated[to_lang][index] = result
+
+    missing = [i for i in range(len(texts)) if any(translated[to_lang][i] is None for to_lang in to_langs)]
+    batches = [
+        [missing[i] for i in batch]
+        for batch in segmenter.pack([texts[i] for i in missing], appvar.config["TRANSLATE_MAX_ELEMENTS"], max_chars)
+    ]
+    return {"head":head, "segments":segments, "texts":texts, "translated":translated, "missing":missing, "batches":batches}
+
+def _fill_document(plan, batch, batch_results):
+    for to_lang, results in batch_results.items():
+        for index, result in zip(batch, results):
+            plan["translated"][to_lang][index] = result
+
+def _finish_document(plan, from_lang, to_langs):
+    """Remember the newly translated segments and stitch each language's document together"""
+    if not plan["texts"]:
+        return {to_lang: _untranslated("", from_lang) for to_lang in to_langs}
+
+    texts, missing, translated = plan["texts"], plan["missing"], plan["translated"]
+    documents = {}
+    for to_lang in to_langs:
+        memory_store().store(from_lang, to_lang, [texts[i] for i in missing], [translated[to_lang][i] for i in missing])
+
+        documents[to_lang] = assemble(plan["head"], plan["segments"], translated[to_lang])
+
+    return documents
+
+def _untranslated(content, from_lang):
+    """content as its own result, for text with nothing to translate"""
+    return {"content":content, "language": {"language":from_lang, "score":1.0 if from_lang else 0.0}}
+
+def _progress_segments(segments, translated, indexes):
+    return [(index, segments[index][0], segments[index][1],
+        {to_lang: results[index] for to_lang, results in translated.items()}) for index in indexes]
+
+def assemble(head, segments, results):
+    """Stitch translated segments back into one result, or return the first error"""
+    errors = [result for result in results if result["language"]["language"] == "Error"]
+    if errors:
+        return errors[0]
+
+    return {
+        "content":segmenter.join(head, segments, [result["content"] for result in results]),
+        "language":detected_language([text for text, _ in segments], results)
+    }
+
+def translate_many(texts, from_lang, to_lang):
+    """
+    Translate many independent texts, packing them into as few requests as
+    the service limits allow and sending the requests concurrently. Texts
+    over the limit are split and put back together.
+
+    Yields (index, result) for each text as soon as all of its pieces are
+    back, so results arrive in completion order rather than input order.
+    """
+    layouts, pieces, batches = _plan_many(texts)
+    for index, (_, segments) in enumerate(layouts):
+        if not segments:
+            yield index, _untranslated(texts[index] or "", from_lang)
+
+    progress = _many_progress(layouts)
+    futures = {
+        translate_pool().submit(quota.carry(translate_batch), [pieces[i][2] for i in batch], from_lang, to_lang): batch
+        for batch in batches
+    }
+
+    for future in as_completed(futures):
+        try:
+            results, error = future.result(), None
+        except Exception as e:
+            results, error = None, e
+        for index, result in _finish_batch(layouts, pieces, progress, futures[future], results, error):
+            yield index, result
+
+def _plan_many(texts):
+    """
+    Split each text into segments within the service limit. Returns the
+    (head, segments) of each text, every segment as (text index, position,
+    segment text) and the segments packed into batches of indexes.
+    """
+    max_chars = appvar.config["TRANSLATE_MAX_CHARS"]
+    layouts = []
+    pieces = []
+    for index, text in enumerate(texts):
+        head, segments = segmenter.segment(text, max_chars)
+        layouts.append((head, segments))
+        for position, (segment_text, _) in enumerate(segments):
+            pieces.append((index, position, segment_text))
+
+    batches = segmenter.pack([piece[2] for piece in pieces], appvar.config["TRANSLATE_MAX_ELEMENTS"], max_chars)
+    return layouts, pieces, batches
+
+def _many_progress(layouts):
+    """The translated pieces of each text so far, how many are still out, and which texts failed"""
+    return {
+        "translated":[[None] * len(segments) for _, segments in layouts],
+        "remaining":[len(segments) for _, segments in layouts],
+        "failed":set()
+    }
+
+def _finish_batch(layouts, pieces, progress, batch, results, error=None):
+    """
+    Record a batch that came back with results, or failed with error, and
+    return (index, result) for each text it completes. A text with a piece
+    in a failed batch is reported as an error, once.
+    """
+    finished = []
+    for n, i in enumerate(batch):
+        index, position, _ = pieces[i]
+        if index in progress["failed"]:
+            continue
+        if error is not None:
+            progress["failed"].add(index)
+            finished.append((index, error_result("There was an error during processing. ({})".format(
+                str(error) or error.__class__.__name__))))
+            continue
+        progress["translated"][index][position] = results[n]
+        progress["remaining"][index] -= 1
+        if progress["remaining"][index] == 0:
+            head, segments = layouts[index]
+            finished.append((index, assemble(head, segments, progress["translated"][index])))
+    return finished
+
+def detected_language(texts, results):
+    """Pick the language that covers the most characters across the segments"""
+    weights = {}
+    scores = {}
+    for text, result in zip(texts, results):
+        language = result["language"]["language"]
+        weights[language] = weights.get(language, 0) + len(text)
+        scores.setdefault(language, []).append(result["language"]["score"])
+    best = max(weights, key=weights.get)
+    return {"language":best, "score":sum(scores[best])/len(scores[best])}
+
 def translate_custom(contents, from_lang, to_lang, category):
     raise NotImplementedError
 
+def _identify(content):
+    """The local guess at the language of content, or None if it isn't confident enough"""
+    lang, confidence = langid.identify(content)
+    if lang is not None and confidence >= appvar.config["LANGID_MIN_CONFIDENCE"]:
+        LANGUAGE_GUESSES.inc(source="local")
+        return {"language":lang, "score":confidence}
+    LANGUAGE_GUESSES.inc(source="service")
+    return None
+
+def guess_language(content):
+    """
+    The source language for translating content. Returns None when the local
+    identifier is unsure, which leaves detection to the Translator service
+    as part of the translation call.
+    """
+    detected = _identify(content)
+    return detected["language"] if detected is not None else None
+
 def detect_language(content):
-    raise NotImplementedError
+    """
+    {"language", "score"} for content. The service's detect call is only
+    made when the local identifier is unsure.
+    """
+    detected = _identify(content)
+    if detected is not None:
+        return detected
+
+    base_url = appvar.config["LANGUAGE_URL"]+PATH_LOOKUP["detect"]
+    service_url = "{}?{}".format(base_url,urlencode({"api-version":API_VERSION}))
+
+    req = http_client.post(
+        call = "detect",
+        url = service_url,
+        headers = headers(appvar.config["COGS_KEY"]),
+        data = json.dumps([{"Text":content[:langid.SAMPLE_CHARS]}]),
+        chars = len(content[:langid.SAMPLE_CHARS])
+    )
+
+    if req.status_code != 200:
+        return {"language":None, "score":0.0}
+    item = req.json()[0]
+    return {"language":item["language"], "score":item["score"]}
 
 def translate_alternatives(content, from_lang, to_lang):
-    results = []
-    header = headers(appvar.config["COGS_KEY"])
+    return lookup_alternatives([content], from_lang, to_lang).get(content.strip(), [])
+
+def lookup_alternatives(terms, from_lang, to_lang):
+    """
+    Look up dictionary alternatives for many terms at once. Terms are
+    deduplicated, cached per (term, from, to), and the ones not in the cache
+    are sent DICTIONARY_MAX_TERMS to a request with the requests running
+    concurrently. Returns {term: translations} for every (stripped) term.
+    """
+    results, batches = _cached_alternatives(terms, from_lang, to_lang)
+    futures = [translate_pool().submit(quota.carry(_dictionary_request), batch, from_lang, to_lang) for batch in batches]
+    _fill_alternatives(results, batches, [future.result() for future in futures], from_lang, to_lang)
+    return results
 
+def _cached_alternatives(terms, from_lang, to_lang):
+    """
+    The cached alternatives of each unique term, and the terms not in the
+    cache packed into batches for the dictionary.
+    """
+    cache = result_cache()
+    unique = list(dict.fromkeys(term.strip() for term in terms if term.strip()))
+
+    results = {}
+    missing = []
+    for term in unique:
+        cached = cache.get(translation_cache.make_key("alternatives", term, from_lang, to_lang, API_VERSION))
+        if cached is not None:
+            results[term] = cached
+        else:
+            missing.append(term)
+
+    max_terms = appvar.config["DICTIONARY_MAX_TERMS"]
+    return results, [missing[i:i+max_terms] for i in range(0, len(missing), max_terms)]
+
+def _fill_alternatives(results, batches, fetched, from_lang, to_lang):
+    cache = result_cache()
+    for batch, batch_results in zip(batches, fetched):
+        for term, translations in zip(batch, batch_results):
+            if translations is None:
+                results[term] = []
+                continue
+            results[term] = translations
+            cache.set(translation_cache.make_key("alternatives", term, from_lang, to_lang, API_VERSION), translations)
+
+def _dictionary_url(from_lang, to_lang):
     base_url = appvar.config["LANGUAGE_URL"]+PATH_LOOKUP["alternatives"]
-    params = {"api-version":'3.0',"from":from_lang, "to":to_lang}
+    params = {"api-version":API_VERSION,"from":from_lang, "to":to_lang}
 
-    service_url = "{}?{}".format(base_url,urlencode(params))
-    
-    data = json.dumps({"Text":content})
+    return "{}?{}".format(base_url,urlencode(params))
 
+def _dictionary_request(terms, from_lang, to_lang):
+    """One call to the dictionary; None in place of each term if it fails"""
+    header = headers(appvar.config["COGS_KEY"])
+    data = json.dumps([{"Text":term} for term in terms])
 
-    req = requests.post(
-        url = service_url,
+    req = http_client.post(
+        call = "dictionary",
+        url = _dictionary_url(from_lang, to_lang),
         headers = header,
-        data = data
+        data = data,
+        chars = billed_characters(terms, [to_lang])
     )
 
     if req.status_code == 200:
-        results = req.json().get("translations")
-    else:
-        print(req.status_code)
-        print(req.json())
+        return [item.get("translations", []) for item in req.json()]
 
-    
-    return results
+    print(req.status_code)
+    print(req.json())
+    return [None] * len(terms)
 
 def list_languages():
+    return fetch_languages()[0]
+
+def fetch_languages(etag=None):
+    """
+    Fetch the languages available for translation. When the ETag of a
+    previous response is passed the service answers 304 if nothing has
+    changed, in which case (None, etag) is returned.
+    """
     header = headers(appvar.config["COGS_KEY"])
+    if etag is not None:
+        header["If-None-Match"] = etag
 
     base_url = appvar.config["LANGUAGE_URL"]+PATH_LOOKUP["list"]
-    params = {"api-version":'3.0',"scope":"translation"}
+    params = {"api-version":API_VERSION,"scope":"translation"}
 
     service_url = "{}?{}".format(base_url,urlencode(params))
 
-    req = requests.get(
+    req = http_client.get(
+        call = "languages",
         url = service_url,
         headers = header
     )
+
+    if req.status_code == 304:
+        return None, etag
     
     results = {"Error":{"name":"Error during processing"}}
 
     if "translation" in req.json():
         results = req.json()["translation"]
 
-    return results
+    return results, req.headers.get("ETag")
 
 
-def ocr_image(img_url, from_lang, mode=None):
+def _ocr_request(img_url, from_lang, mode, img_bytes):
+    """The url, query parameters, headers and body of a recognition request"""
     header = headers(appvar.config["VISION_KEY"])
     service_url = appvar.config["VISION_URL"]
 
@@ -142,13 +602,63 @@ def ocr_image(img_url, from_lang, mode=None):
     else:
         service_url = service_url + "ocr"
 
-    req = requests.post(
+    if img_bytes is not None:
+        header['Content-type'] = 'application/octet-stream'
+        data = img_bytes
+    else:
+        data = json.dumps({"url":img_url})
+
+    return service_url, params, header, data
+
+_ocr_flight = singleflight.SingleFlight("ocr")
+
+def ocr_keys(img_url, from_lang, mode, img_bytes):
+    """
+    The result cache key and the in-flight key for a recognition. Images
+    sent as bytes are addressed by the SHA-256 of their content; an image
+    only known by URL isn't cached, as what is behind the URL may change.
+    """
+    if img_bytes is None:
+        return None, (img_url, from_lang, mode)
+    digest = hashlib.sha256(img_bytes).hexdigest()
+    cache_key = translation_cache.make_key("ocr", digest, from_lang, mode or "Printed", OCR_API_VERSION)
+    return cache_key, (digest, from_lang, mode)
+
+def ocr_image(img_url, from_lang, mode=None, img_bytes=None, prepare=None):
+    """
+    Recognize the text in an image, either fetched by the service from
+    img_url or sent directly as img_bytes, which saves the blob upload and
+    the service's download before recognition can start. The text of an
+    image seen before comes from the cache, and the same image submitted
+    again while it is still being recognized shares that call.
+
+    prepare, if given, is called with (img_bytes, mode) for the image to
+    send instead. Images are cached by the bytes as given, so it only runs
+    for images that are not in the cache.
+    """
+    cache_key, flight_key = ocr_keys(img_url, from_lang, mode, img_bytes)
+    if cache_key is not None:
+        cached = result_cache().get(cache_key)
+        if cached is not None:
+            return cached
+
+    text = _ocr_flight.do(flight_key, _ocr_image, img_url, from_lang, mode, img_bytes, prepare)
+    if cache_key is not None:
+        result_cache().set(cache_key, text)
+    return text
+
+def _ocr_image(img_url, from_lang, mode, img_bytes, prepare=None):
+    if prepare is not None:
+        img_bytes = prepare(img_bytes, mode)
+    service_url, params, header, data = _ocr_request(img_url, from_lang, mode, img_bytes)
+
+    req = http_client.post(
+        call = "ocr_submit",
         url = service_url,
         params = params,
         headers = header,
-        data = json.dumps({"url":img_url})
+        data = data
     )
-    print(req.status_code)
     # If we don't get a 200, blow up
     try:
         req.raise_for_status()
@@ -166,6 +676,42 @@ def ocr_image(img_url, from_lang, mode=None):
     return results
         
 
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+def ocr_pool():
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            _ocr_pool = ThreadPoolExecutor(max_workers=appvar.config["OCR_PAGE_WORKERS"])
+    return _ocr_pool
+
+def _ocr_page(image, from_lang, mode):
+    try:
+        return ocr_image(img_url = None, from_lang = from_lang, mode = mode, img_bytes = image)
+    except Exception:
+        # One unreadable page shouldn't lose the rest of the document
+        traceback.print_exc()
+        return ""
+
+def ocr_pages(images, from_lang="unk", mode=None):
+    """
+    Recognize the text of many page images, OCR_PAGE_WORKERS at a time.
+    images may be a generator; no more are taken from it than there are
+    pages in flight. Returns the texts in page order, "" for pages that
+    could not be read.
+    """
+    max_in_flight = appvar.config["OCR_PAGE_WORKERS"]
+    texts = []
+    in_flight = deque()
+    for image in images:
+        in_flight.append(ocr_pool().submit(quota.carry(_ocr_page), image, from_lang, mode))
+        if len(in_flight) >= max_in_flight:
+            texts.append(in_flight.popleft().result())
+    for future in in_flight:
+        texts.append(future.result())
+    return texts
+
 def ocr_parse_printed(json_object):
     line_infos = [region["lines"] for region in json_object["regions"]]
     word_infos = []
@@ -177,26 +723,48 @@ def ocr_parse_printed(json_object):
     return ' '.join(word_infos)
 
 def ocr_parse_handwritten(req,headers):
-    print(req.headers)
     operation_url = req.headers["Operation-Location"]
 
     # The recognized text isn't immediately available, so poll to wait for completion.
+    # Wait as long as the service asks, otherwise back off gradually so short
+    # notes come back quickly without hammering the service on long ones.
+    delay = http_client.retry_after(req) or appvar.config["OCR_POLL_INITIAL"]
+    deadline = time.time() + appvar.config["OCR_POLL_TIMEOUT"]
     analysis = {}
-    while "recognitionResult" not in analysis:
-        response_final = requests.get(
+    while True:
+        time.sleep(delay)
+        response_final = http_client.get(
+            call = "ocr_poll",
             url = operation_url, 
             headers=headers
         )
         analysis = response_final.json()
-        print("Looping")
-        time.sleep(1)
+        if _operation_finished(analysis, delay, deadline):
+            break
+
+        delay = _next_poll_delay(response_final, delay)
+
+    return handwritten_text(analysis)
+
+def _operation_finished(analysis, delay, deadline):
+    """True once the text is ready; raises if it failed or the next poll would be too late"""
+    if "recognitionResult" in analysis:
+        return True
+    if analysis.get("status") == "Failed":
+        raise RuntimeError("Handwriting recognition failed")
+    if time.time() + delay > deadline:
+        raise TimeoutError("Handwriting recognition did not finish in time")
+    return False
 
+def _next_poll_delay(response, delay):
+    return http_client.retry_after(response) or \
+        min(delay * appvar.config["OCR_POLL_BACKOFF"], appvar.config["OCR_POLL_MAX"])
+
+def handwritten_text(analysis):
     # Extract the recognized text
     tokens = [line["text"] for line in analysis["recognitionResult"]["lines"]]
 
-    results = ' '.join(tokens)
-
-    return results
+    return ' '.join(tokens)
 
 if __name__ == "__main__":
     # translate_text("ZZZZZ!", "en","de")
@@ -0,0 +1,188 @@
+"""
+Coroutine versions of the calls in api_calls, for the ASGI app (asgi.py).
+A call waiting on the Translator or Vision service holds a coroutine
+rather than a worker thread, so one process can keep hundreds in flight.
+Request building, response parsing, planning and caching are shared with
+api_calls, which remains the way for synchronous code to make these calls.
+The caches and translation memory are SQLite behind a lock shared with the
+Flask threads, so they are only used from the executor.
+"""
+import asyncio
+import functools
+import json
+import time
+
+from app import appvar
+from util import api_calls
+from util import async_http
+from util import singleflight
+from util.api_calls import headers, result_cache
+
+
+async def _in_executor(fn, *args):
+    return await asyncio.get_event_loop().run_in_executor(None, functools.partial(fn, *args))
+
+
+async def _bounded(coros, limit):
+    """Run coroutines at most limit at a time, returning their results in order"""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*[run(coro) for coro in coros])
+
+
+async def translate_text(contents, from_lang, to_lang):
+    return (await translate_batch([contents], from_lang, to_lang))[0]
+
+async def translate_batch(texts, from_lang, to_lang):
+    return (await translate_batch_multi(texts, from_lang, [to_lang]))[to_lang]
+
+async def translate_batch_multi(texts, from_lang, to_langs):
+    """See api_calls.translate_batch_multi"""
+    keys, results, missing, targets = await _in_executor(api_calls._cached_translations, texts, from_lang, to_langs)
+    if missing:
+        request_texts = [texts[i] for i in missing]
+        fetched = await _translate_flight.do(api_calls.translate_flight_key(request_texts, from_lang, targets),
+            _translate_request, request_texts, from_lang, targets)
+        await _in_executor(api_calls._fill_translations, keys, results, missing, targets, fetched)
+
+    return results
+
+_translate_flight = singleflight.AsyncSingleFlight("translate")
+
+async def _translate_request(texts, from_lang, to_langs):
+    req = await async_http.post(
+        call = "translate",
+        url = api_calls._translate_url(from_lang, to_langs),
+        headers = headers(appvar.config["COGS_KEY"]),
+        data = json.dumps([{"Text":text} for text in texts]),
+        chars = api_calls.billed_characters(texts, to_langs)
+    )
+
+    try:
+        body = req.json()
+    except ValueError:
+        body = None
+    return api_calls._translate_results(req.status_code, body, texts, from_lang, to_langs)
+
+async def translate_document(contents, from_lang, to_lang):
+    return (await translate_document_multi(contents, from_lang, [to_lang]))[to_lang]
+
+async def translate_document_multi(contents, from_lang, to_langs):
+    """See api_calls.translate_document_multi"""
+    plan = await _in_executor(api_calls._plan_document, contents, from_lang, to_langs)
+    texts = plan["texts"]
+    fetched = await _bounded(
+        [translate_batch_multi([texts[i] for i in batch], from_lang, to_langs) for batch in plan["batches"]],
+        appvar.config["TRANSLATE_WORKERS"]
+    )
+    for batch, batch_results in zip(plan["batches"], fetched):
+        api_calls._fill_document(plan, batch, batch_results)
+
+    return await _in_executor(api_calls._finish_document, plan, from_lang, to_langs)
+
+async def translate_many(texts, from_lang, to_lang):
+    """See api_calls.translate_many; an async generator of (index, result)"""
+    layouts, pieces, batches = api_calls._plan_many(texts)
+    for index, (_, segments) in enumerate(layouts):
+        if not segments:
+            yield index, api_calls._untranslated(texts[index] or "", from_lang)
+
+    progress = api_calls._many_progress(layouts)
+    semaphore = asyncio.Semaphore(appvar.config["TRANSLATE_WORKERS"])
+
+    async def run(batch):
+        async with semaphore:
+            try:
+                return batch, await translate_batch([pieces[i][2] for i in batch], from_lang, to_lang), None
+            except Exception as e:
+                return batch, None, e
+
+    for future in asyncio.as_completed([run(batch) for batch in batches]):
+        batch, results, error = await future
+        for index, result in api_calls._finish_batch(layouts, pieces, progress, batch, results, error):
+            yield index, result
+
+async def translate_alternatives(content, from_lang, to_lang):
+    return (await lookup_alternatives([content], from_lang, to_lang)).get(content.strip(), [])
+
+async def lookup_alternatives(terms, from_lang, to_lang):
+    """See api_calls.lookup_alternatives"""
+    results, batches = await _in_executor(api_calls._cached_alternatives, terms, from_lang, to_lang)
+    fetched = await _bounded([_dictionary_request(batch, from_lang, to_lang) for batch in batches],
+        appvar.config["TRANSLATE_WORKERS"])
+    await _in_executor(api_calls._fill_alternatives, results, batches, fetched, from_lang, to_lang)
+    return results
+
+async def _dictionary_request(terms, from_lang, to_lang):
+    req = await async_http.post(
+        call = "dictionary",
+        url = api_calls._dictionary_url(from_lang, to_lang),
+        headers = headers(appvar.config["COGS_KEY"]),
+        data = json.dumps([{"Text":term} for term in terms]),
+        chars = api_calls.billed_characters(terms, [to_lang])
+    )
+
+    if req.status_code == 200:
+        return [item.get("translations", []) for item in req.json()]
+
+    print(req.status_code)
+    return [None] * len(terms)
+
+_ocr_flight = singleflight.AsyncSingleFlight("ocr")
+
+async def ocr_image(img_url, from_lang, mode=None, img_bytes=None, prepare=None):
+    """See api_calls.ocr_image; prepare runs on the executor"""
+    cache_key, flight_key = api_calls.ocr_keys(img_url, from_lang, mode, img_bytes)
+    if cache_key is not None:
+        cached = await _in_executor(lambda: result_cache().get(cache_key))
+        if cached is not None:
+            return cached
+
+    text = await _ocr_flight.do(flight_key, _ocr_image, img_url, from_lang, mode, img_bytes, prepare)
+    if cache_key is not None:
+        await _in_executor(lambda: result_cache().set(cache_key, text))
+    return text
+
+async def _ocr_image(img_url, from_lang, mode, img_bytes, prepare=None):
+    if prepare is not None:
+        img_bytes = await _in_executor(prepare, img_bytes, mode)
+    service_url, params, header, data = api_calls._ocr_request(img_url, from_lang, mode, img_bytes)
+
+    req = await async_http.post(
+        call = "ocr_submit",
+        url = service_url,
+        params = params,
+        headers = header,
+        data = data
+    )
+    if req.status_code >= 400:
+        print(req.status_code)
+
+    if mode == "Handwritten":
+        return await ocr_parse_handwritten(req, header)
+    return api_calls.ocr_parse_printed(req.json())
+
+async def ocr_parse_handwritten(req, headers):
+    """Poll for the recognized text without holding a thread between polls"""
+    operation_url = req.headers["Operation-Location"]
+
+    delay = async_http.retry_after(req) or appvar.config["OCR_POLL_INITIAL"]
+    deadline = time.time() + appvar.config["OCR_POLL_TIMEOUT"]
+    while True:
+        await asyncio.sleep(delay)
+        response_final = await async_http.get(
+            call = "ocr_poll",
+            url = operation_url,
+            headers = headers
+        )
+        analysis = response_final.json()
+        if api_calls._operation_finished(analysis, delay, deadline):
+            break
+
+        delay = api_calls._next_poll_delay(response_final, delay)
+
+    return api_calls.handwritten_text(analysis)
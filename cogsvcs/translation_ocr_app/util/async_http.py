@@ -0,0 +1,110 @@
+import asyncio
+import json
+import time
+
+import aiohttp
+from app import appvar
+from util import quota
+from util.http_client import RETRY_STATUSES, OUTBOUND_SECONDS, OUTBOUND_RETRIES, backoff_delay, endpoint_of, retry_after
+
+# Sessions belong to the event loop they were made on
+_sessions = {}
+
+
+class Response(object):
+    """The parts of a response the api calls use, read before the connection is released"""
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content.decode("utf-8"))
+
+
+def get_session(url):
+    """
+    Return the session for the endpoint of url on the running event loop.
+    Up to ASYNC_HTTP_POOL_SIZE connections are kept open per endpoint;
+    waiting on a connection costs a coroutine, not a thread.
+    """
+    key = (id(asyncio.get_event_loop()), endpoint_of(url))
+    session = _sessions.get(key)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit_per_host=appvar.config["ASYNC_HTTP_POOL_SIZE"])
+        session = aiohttp.ClientSession(connector=connector,
+            timeout=aiohttp.ClientTimeout(total=appvar.config["HTTP_TIMEOUT"]))
+        _sessions[key] = session
+    return session
+
+
+async def close_sessions():
+    loop_id = id(asyncio.get_event_loop())
+    for key in [key for key in _sessions if key[0] == loop_id]:
+        await _sessions.pop(key).close()
+
+
+async def request(method, url, call="other", chars=0, **kwargs):
+    """
+    The coroutine version of http_client.request, with the same retries,
+    backoff, quotas and latency metrics.
+    """
+    start = time.time()
+    status = "error"
+    try:
+        response = await _request_with_retries(method, url, call, chars, **kwargs)
+        status = response.status_code
+        return response
+    finally:
+        OUTBOUND_SECONDS.observe(time.time() - start, call=call, status=status)
+
+
+async def _request_with_retries(method, url, call, chars, **kwargs):
+    session = get_session(url)
+    max_retries = appvar.config["HTTP_MAX_RETRIES"]
+    budget = quota.for_request(call, kwargs.get("headers"))
+    # aiohttp only takes strings; match requests, which leaves out None headers and str()s parameters
+    if kwargs.get("headers"):
+        kwargs["headers"] = {key: value for key, value in kwargs["headers"].items() if value is not None}
+    if kwargs.get("params"):
+        kwargs["params"] = {key: str(value) for key, value in kwargs["params"].items()}
+
+    # Retries are the same request, so it is charged against the quota once
+    if budget is not None:
+        await budget.acquire_async(chars)
+
+    attempt = 0
+    while True:
+        try:
+            async with session.request(method, url, **kwargs) as raw:
+                response = Response(raw.status, raw.headers, await raw.read())
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt >= max_retries:
+                raise
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
+            OUTBOUND_RETRIES.inc(call=call)
+            continue
+
+        if response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+            return response
+
+        delay = retry_after(response)
+        if delay is None:
+            delay = backoff_delay(attempt)
+        elif delay > appvar.config["HTTP_BACKOFF_MAX"]:
+            return response
+        if response.status_code == 429 and budget is not None:
+            budget.throttled(delay)
+        await asyncio.sleep(delay)
+        attempt += 1
+        OUTBOUND_RETRIES.inc(call=call)
+
+
+async def get(url, call="other", **kwargs):
+    return await request("GET", url, call, **kwargs)
+
+
+async def post(url, call="other", **kwargs):
+    return await request("POST", url, call, **kwargs)
@@ -0,0 +1,18 @@
+"""
+Coroutine versions of the uploads in storage. The blob SDK only has a
+blocking client, so uploads run on the event loop's default executor and
+the coroutine just waits for them.
+"""
+import asyncio
+import functools
+
+from util import storage
+
+
+async def _in_executor(fn, *args, **kwargs):
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+
+async def archive_bytes(content, filename, content_type=None):
+    return await _in_executor(storage.archive_bytes, content, filename, content_type)
@@ -1,15 +1,172 @@
-from tika import parser
+import io
+import os
+import time
+from util import metrics
 
-def crack_pdf(fp):
-    parsed = parser.from_file(fp)
+# pdfminer reads text-layer PDFs in process; Tika needs a JVM server and is
+# only used for documents pdfminer can't open
+try:
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+except ImportError:
+    extract_pages = None
+
+try:
+    from tika import parser
+except ImportError:
+    parser = None
+
+# PyMuPDF renders scanned pages to images for OCR
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+DEFAULT_ENGINES = ("pdfminer", "tika")
+
+CRACK_SECONDS = metrics.histogram("translation_app_crack_seconds",
+    "Time to extract the text of a document", ["engine", "status"])
+
+
+def _open(document):
+    """
+    A file object for bytes or an already open file. Open files are rewound
+    so each engine starts from the beginning.
+    """
+    if isinstance(document, (bytes, bytearray)):
+        return io.BytesIO(document)
+    document.seek(0)
+    return document
+
+
+def iter_pages(fp):
+    """
+    Yield the text of each page in turn without loading the whole document.
+    fp may be a path, the PDF as bytes or a binary file object.
+    """
+    if extract_pages is None:
+        raise RuntimeError("pdfminer.six is not installed")
+    if isinstance(fp, str):
+        pages = extract_pages(fp)
+    else:
+        pages = extract_pages(_open(fp))
+    for page_layout in pages:
+        yield "".join(element.get_text() for element in page_layout if isinstance(element, LTTextContainer))
+
+
+def _crack_pdfminer(fp):
+    texts = list(iter_pages(fp))
+    return "\n".join(texts), len(texts)
+
+
+def _crack_tika(fp):
+    if parser is None:
+        raise RuntimeError("tika is not installed")
+    # Tika can read a file on disk itself; anything else is sent as a buffer
+    path = fp if isinstance(fp, str) else getattr(fp, "name", None)
+    if isinstance(path, str) and os.path.isfile(path):
+        parsed = parser.from_file(path)
+    else:
+        parsed = parser.from_buffer(_open(fp).read())
     #print(parsed["metadata"])
-    return parsed["content"]
+    return parsed["content"], None
+
+
+ENGINES = {
+    "pdfminer":_crack_pdfminer,
+    "tika":_crack_tika
+}
+
+
+def _record(engine, seconds, failed):
+    CRACK_SECONDS.observe(seconds, engine=engine, status="failed" if failed else "ok")
+
+
+def crack_document(fp, engines=None):
+    """
+    Extract the text of a PDF with the first engine that can handle it. fp
+    may be a path, the PDF as bytes or a seekable binary file object.
+    Returns {"content", "engine", "seconds", "pages"}, where pages is None
+    if the engine doesn't count them.
+    """
+    errors = []
+    for engine in engines or DEFAULT_ENGINES:
+        start = time.time()
+        try:
+            content, pages = ENGINES[engine](fp)
+        except Exception as e:
+            _record(engine, time.time() - start, True)
+            errors.append("{}: {}".format(engine, e))
+            continue
+        seconds = time.time() - start
+        _record(engine, seconds, False)
+        return {"content":content, "engine":engine, "seconds":seconds, "pages":pages}
+
+    raise ValueError("Could not extract text ({})".format("; ".join(errors)))
+
+
+def crack_pdf(fp, engines=None):
+    return crack_document(fp, engines)["content"]
+
+
+def _open_fitz(fp):
+    if fitz is None:
+        raise RuntimeError("PyMuPDF is not installed")
+    path = fp if isinstance(fp, str) else getattr(fp, "name", None)
+    if isinstance(path, str) and os.path.isfile(path):
+        return fitz.open(path)
+    return fitz.open(stream=_open(fp).read(), filetype="pdf")
+
+
+def looks_scanned(cracked, min_chars):
+    """
+    True if the text crack_document extracted averages fewer than min_chars
+    a page. Documents from an engine that doesn't count pages (Tika, which
+    only gets those pdfminer couldn't open) are taken as not scanned.
+    """
+    if cracked.get("pages") is None:
+        return False
+    return len((cracked["content"] or "").strip()) < min_chars * max(1, cracked["pages"])
+
+
+def crack_scanned(fp, ocr_pages, min_chars=20, dpi=200):
+    """
+    Extract the text of a PDF whose pages are (partly) scanned images. Pages
+    with fewer than min_chars characters of text are rendered at dpi and
+    handed to ocr_pages, which takes an iterable of PNG images and returns
+    their texts in order. Returns {"content", "engine", "seconds", "pages",
+    "ocr_pages"}.
+    """
+    start = time.time()
+    failed = True
+    try:
+        with _open_fitz(fp) as pdf:
+            texts = [page.get_text() for page in pdf]
+            scanned = [number for number, text in enumerate(texts) if len(text.strip()) < min_chars]
+
+            # Pages are rendered one at a time as the OCR workers are ready
+            # for them, so a long scan is never held in memory all at once
+            zoom = dpi / 72.0
+            images = (
+                pdf[number].get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY).tobytes("png")
+                for number in scanned
+            )
+            for number, text in zip(scanned, ocr_pages(images)):
+                texts[number] = text
+        failed = False
+    finally:
+        _record("ocr", time.time() - start, failed)
+
+    return {"content":"\n".join(texts), "engine":"ocr", "seconds":time.time() - start, "pages":len(texts),
+        "ocr_pages":len(scanned)}
 
 if __name__ == "__main__":
     import argparse
 
     argparser = argparse.ArgumentParser()
     argparser.add_argument("-f","--filepath",help="Filepath")
+    argparser.add_argument("-e","--engines",help="Comma separated engines to try, in order")
     args = argparser.parse_args()
-    
-    crack_pdf(args.filepath)
\ No newline at end of file
+
+    cracked = crack_document(args.filepath, args.engines.split(",") if args.engines else None)
+    print("{} chars extracted by {} in {:.2f}s".format(len(cracked["content"] or ""), cracked["engine"], cracked["seconds"]))
@@ -0,0 +1,155 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from app import appvar
+from util import metrics
+from util import quota
+
+# Throttling and transient service errors worth another attempt
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+OUTBOUND_SECONDS = metrics.histogram("translation_app_outbound_request_seconds",
+    "Latency of calls to external services, including retries", ["call", "status"])
+OUTBOUND_RETRIES = metrics.counter("translation_app_outbound_retries_total",
+    "Retried calls to external services", ["call"])
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def endpoint_of(url):
+    parts = urlsplit(url)
+    return "{}://{}".format(parts.scheme, parts.netloc)
+
+
+def get_session(url):
+    """
+    Return the process-wide session for the endpoint (scheme + host) of url.
+
+    Each endpoint gets its own keep-alive connection pool so the Translator
+    and Vision services don't compete for sockets and repeat calls skip the
+    TCP and TLS handshake.
+    """
+    endpoint = endpoint_of(url)
+    session = _sessions.get(endpoint)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(endpoint)
+            if session is None:
+                adapter = HTTPAdapter(
+                    pool_connections = 1,
+                    pool_maxsize = appvar.config["HTTP_POOL_SIZE"]
+                )
+                session = requests.Session()
+                session.mount(endpoint, adapter)
+                _sessions[endpoint] = session
+    return session
+
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def retry_after(response):
+    """
+    Seconds the service asked us to wait, or None if it didn't say.
+    Retry-After may be either a number of seconds or an HTTP date.
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt):
+    # "Full jitter" exponential backoff so concurrent callers spread out
+    ceiling = min(appvar.config["HTTP_BACKOFF_MAX"], appvar.config["HTTP_BACKOFF"] * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+def request(method, url, call="other", chars=0, **kwargs):
+    """
+    Send a request through the pooled session for url, retrying connection
+    errors and 429/5xx responses with jittered backoff. A Retry-After header
+    is honoured as long as it is within HTTP_BACKOFF_MAX, otherwise the
+    throttled response is returned to the caller as-is. call names the kind
+    of request in the latency metrics and picks the quota it waits for,
+    which chars (the characters billed) counts against.
+    """
+    start = time.time()
+    status = "error"
+    try:
+        response = _request_with_retries(method, url, call, chars, **kwargs)
+        status = response.status_code
+        return response
+    finally:
+        OUTBOUND_SECONDS.observe(time.time() - start, call=call, status=status)
+
+
+def _request_with_retries(method, url, call, chars, **kwargs):
+    session = get_session(url)
+    kwargs.setdefault("timeout", appvar.config["HTTP_TIMEOUT"])
+    max_retries = appvar.config["HTTP_MAX_RETRIES"]
+    budget = quota.for_request(call, kwargs.get("headers"))
+
+    # Retries are the same request, so it is charged against the quota once
+    if budget is not None:
+        budget.acquire(chars)
+
+    attempt = 0
+    while True:
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= max_retries:
+                raise
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+            OUTBOUND_RETRIES.inc(call=call)
+            continue
+
+        if response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+            return response
+
+        delay = retry_after(response)
+        if delay is None:
+            delay = backoff_delay(attempt)
+        elif delay > appvar.config["HTTP_BACKOFF_MAX"]:
+            return response
+
+        response.close()
+        if response.status_code == 429 and budget is not None:
+            # Everyone sharing the key backs off, not just this caller
+            budget.throttled(delay)
+        time.sleep(delay)
+        attempt += 1
+        OUTBOUND_RETRIES.inc(call=call)
+
+
+def get(url, call="other", **kwargs):
+    return request("GET", url, call, **kwargs)
+
+
+def post(url, call="other", **kwargs):
+    return request("POST", url, call, **kwargs)
@@ -0,0 +1,105 @@
+"""
+Normalize images before they are sent for OCR. Phone photos are often
+several MB, rotated only by an EXIF tag and far larger than recognition
+needs, so they are turned upright, scaled down to the largest size the OCR
+mode benefits from, made grayscale and recompressed.
+"""
+import io
+
+from PIL import Image
+
+from app import appvar
+from util import metrics
+
+# EXIF Orientation and how to undo each value
+ORIENTATION_TAG = 274
+TRANSPOSES = {
+    2:Image.FLIP_LEFT_RIGHT,
+    3:Image.ROTATE_180,
+    4:Image.FLIP_TOP_BOTTOM,
+    5:Image.TRANSPOSE,
+    6:Image.ROTATE_270,
+    7:Image.TRANSVERSE,
+    8:Image.ROTATE_90
+}
+
+# What the Computer Vision service accepts; anything else Pillow can read is converted
+SERVICE_FORMATS = ("JPEG", "PNG", "GIF", "BMP")
+
+OCR_IMAGE_BYTES = metrics.histogram("translation_app_ocr_image_bytes",
+    "Size of images submitted for OCR, as uploaded and as sent", ["stage"],
+    buckets=(16*1024, 64*1024, 256*1024, 1024*1024, 2*1024*1024, 4*1024*1024, 8*1024*1024, 16*1024*1024))
+PREP_SECONDS = metrics.histogram("translation_app_image_prep_seconds", "Time to normalize an image before OCR")
+
+
+def orientation(image):
+    # getexif() arrived in Pillow 6; older versions only read EXIF from JPEGs
+    if hasattr(image, "getexif"):
+        exif = image.getexif()
+    elif hasattr(image, "_getexif"):
+        exif = image._getexif()
+    else:
+        exif = None
+    return (exif or {}).get(ORIENTATION_TAG, 1)
+
+
+def normalize(image, max_side, grayscale=True):
+    """An upright copy of image no larger than max_side on either side"""
+    transpose = TRANSPOSES.get(orientation(image))
+    # Decoding a JPEG at a fraction of its size is much cheaper than resizing afterwards
+    image.draft("L" if grayscale else "RGB", (max_side, max_side))
+
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        # Transparent areas would turn black; text on them reads better on white
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image)
+    image = image.convert("L" if grayscale else "RGB")
+
+    if transpose is not None:
+        image = image.transpose(transpose)
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return image
+
+
+def prepare(content, mode=None):
+    """
+    The image to send for OCR in place of content. Small images that are
+    already upright, within size and in a format the service accepts are
+    sent as they are, as is anything Pillow cannot read, which is left for
+    the service to judge. TIFFs and other formats it rejects become JPEGs.
+    """
+    OCR_IMAGE_BYTES.observe(len(content), stage="uploaded")
+    with PREP_SECONDS.time():
+        prepared = _prepare(content, mode)
+    OCR_IMAGE_BYTES.observe(len(prepared), stage="sent")
+    return prepared
+
+
+def _prepare(content, mode):
+    config = appvar.config
+    max_side = config["OCR_PREP_HANDWRITTEN_MAX_SIDE"] if mode == "Handwritten" else config["OCR_PREP_PRINTED_MAX_SIDE"]
+    try:
+        image = Image.open(io.BytesIO(content))
+        # Only size, orientation and format matter to the service; other changes are just to save bytes
+        needed = (max(image.size) > max_side or orientation(image) != 1 or len(content) > config["OCR_PREP_MAX_BYTES"]
+            or image.format not in SERVICE_FORMATS)
+        if not needed and len(content) <= config["OCR_PREP_MIN_BYTES"]:
+            return content
+        image = normalize(image, max_side, config["OCR_PREP_GRAYSCALE"])
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return content
+
+    # Step the quality down until the image fits the service's size limit
+    quality = config["OCR_PREP_QUALITY"]
+    while True:
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+        prepared = output.getvalue()
+        if len(prepared) <= config["OCR_PREP_MAX_BYTES"] or quality <= 40:
+            break
+        quality -= 15
+
+    # Recompressing an image that was already small can make it bigger
+    return prepared if needed or len(prepared) < len(content) else content
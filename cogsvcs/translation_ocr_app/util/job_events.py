@@ -0,0 +1,61 @@
+import threading
+import time
+
+
+class JobEvents(object):
+    """
+    Events published by background jobs as they run, kept in memory so a
+    page can follow a job live and, after reconnecting, pick up from the
+    last event it saw. A job's events are dropped ttl seconds after its
+    last one.
+    """
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._logs = {}
+        self._changed = threading.Condition()
+
+    def publish(self, job_id, kind, data, last=False):
+        """Add an event to the job's log; last marks the end of the job"""
+        with self._changed:
+            self._expire()
+            log = self._logs.setdefault(job_id, {"events":[], "closed":None})
+            log["events"].append((kind, data))
+            if last:
+                log["closed"] = time.time()
+            self._changed.notify_all()
+
+    def follow(self, job_id, after=0, timeout=15):
+        """
+        Yield (event id, kind, data) for each of the job's events after the
+        id after, waiting for new ones until the last has been published.
+        None is yielded whenever timeout seconds pass without one, so the
+        caller can keep its connection open. Nothing is yielded for a job
+        with no events.
+        """
+        position = after
+        while True:
+            with self._changed:
+                log = self._logs.get(job_id)
+                if log is None:
+                    return
+                if position >= len(log["events"]) and log["closed"] is None:
+                    self._changed.wait(timeout)
+                events = log["events"][position:]
+                closed = log["closed"] is not None
+
+            if not events:
+                if closed:
+                    return
+                yield None
+                continue
+            for kind, data in events:
+                position += 1
+                yield position, kind, data
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, log in self._logs.items()
+            if log["closed"] is not None and log["closed"] < cutoff]
+        for job_id in expired:
+            del self._logs[job_id]
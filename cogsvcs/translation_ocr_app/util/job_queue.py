@@ -0,0 +1,63 @@
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue(object):
+    """
+    Runs slow work on a background worker pool so web requests can return
+    straight away with a job id. Finished jobs are kept in memory for ttl
+    seconds so their result can be collected.
+    """
+
+    def __init__(self, max_workers, ttl=3600):
+        self.ttl = ttl
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        job_id = str(uuid.uuid4())
+        job = {"id":job_id, "status":QUEUED, "result":None, "error":None,
+            "created":time.time(), "started":None, "finished":None}
+        with self._lock:
+            self._expire()
+            self._jobs[job_id] = job
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job, fn, args, kwargs):
+        job["status"] = RUNNING
+        job["started"] = time.time()
+        try:
+            job["result"] = fn(*args, **kwargs)
+            job["status"] = DONE
+        except Exception as e:
+            traceback.print_exc()
+            job["error"] = str(e) or e.__class__.__name__
+            job["status"] = FAILED
+        job["finished"] = time.time()
+
+    def get(self, job_id):
+        """A snapshot of the job, or None if it is unknown or has expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def pending(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job["status"] in (QUEUED, RUNNING))
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+            if job["finished"] is not None and job["finished"] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+import time
+from app import appvar
+from util import api_calls
+from util.lang_list import lang_list
+
+# Used until the service has been reached at least once
+_STATIC = {code: {"name":name} for code, name in lang_list}
+
+_lock = threading.Lock()
+_state = {"languages":None, "etag":None, "fetched":0.0, "attempted":0.0, "refreshing":False}
+
+
+def _load_disk():
+    path = appvar.config["LANGUAGE_CACHE_PATH"]
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return
+    _state.update(languages=cached["languages"], etag=cached.get("etag"), fetched=cached.get("fetched", 0.0))
+
+
+def _save_disk():
+    path = appvar.config["LANGUAGE_CACHE_PATH"]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"languages":_state["languages"], "etag":_state["etag"], "fetched":_state["fetched"]}, f)
+    os.replace(tmp_path, path)
+
+
+def refresh():
+    """Revalidate the catalogue against the service, keeping the old copy on failure"""
+    try:
+        languages, etag = api_calls.fetch_languages(_state["etag"] if _state["languages"] else None)
+    except Exception as e:
+        print("Language refresh failed: {}".format(e))
+        languages = {"Error":str(e)}
+
+    with _lock:
+        _state["refreshing"] = False
+        if languages is not None and "Error" in languages:
+            return
+        if languages is not None:
+            _state.update(languages=languages, etag=etag)
+        _state["fetched"] = time.time()
+        try:
+            _save_disk()
+        except OSError as e:
+            print("Could not save language cache: {}".format(e))
+
+
+def languages():
+    """
+    The languages available for translation, as returned by the service.
+    Never waits on the network: a stale copy is served while a background
+    thread revalidates it.
+    """
+    with _lock:
+        if _state["languages"] is None:
+            _load_disk()
+
+        now = time.time()
+        ttl = appvar.config["LANGUAGE_CACHE_TTL"]
+        stale = now - _state["fetched"] > ttl
+        # After a failed refresh, wait before asking the service again
+        backed_off = now - _state["attempted"] < min(ttl, appvar.config["LANGUAGE_CACHE_RETRY"])
+        if stale and not backed_off and not _state["refreshing"]:
+            _state.update(refreshing=True, attempted=now)
+            threading.Thread(target=refresh, daemon=True).start()
+
+        return _state["languages"] or _STATIC
+
+
+def choices():
+    """(code, name) pairs for form select fields"""
+    return sorted(((code, info["name"]) for code, info in languages().items()), key=lambda c: c[0])
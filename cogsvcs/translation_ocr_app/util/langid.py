@@ -0,0 +1,128 @@
+import math
+import re
+from bisect import bisect_right
+from collections import Counter
+
+from util.langid_samples import samples, simplified_only, traditional_only
+
+# Only the start of a long document is needed to tell its language
+SAMPLE_CHARS = 2000
+MIN_LETTERS = 10
+# Where languages share a script, one or two words can look like any of them
+MIN_WORDS = 3
+WORD_WEIGHT = 2.0
+
+# (first code point, last code point, script); scripts used by a single
+# language in lang_list are named after that language
+_RANGES = sorted([
+    (0x0041, 0x005A, "latin"), (0x0061, 0x007A, "latin"), (0x00C0, 0x024F, "latin"), (0x1E00, 0x1EFF, "latin"),
+    (0x0370, 0x03FF, "el"),
+    (0x0400, 0x04FF, "cyrillic"),
+    (0x0590, 0x05FF, "he"),
+    (0x0600, 0x06FF, "arabic"), (0x0750, 0x077F, "arabic"), (0xFB50, 0xFDFF, "arabic"), (0xFE70, 0xFEFF, "arabic"),
+    (0x0900, 0x097F, "hi"),
+    (0x0980, 0x09FF, "bn"),
+    (0x0B80, 0x0BFF, "ta"),
+    (0x0E00, 0x0E7F, "th"),
+    (0x1100, 0x11FF, "ko"), (0x3130, 0x318F, "ko"), (0xAC00, 0xD7AF, "ko"),
+    (0x3040, 0x30FF, "kana"),
+    (0x3400, 0x4DBF, "han"), (0x4E00, 0x9FFF, "han"),
+])
+_STARTS = [start for start, _, _ in _RANGES]
+
+_WORD = re.compile(r"[^\W\d_]+")
+
+
+def script_of(ch):
+    i = bisect_right(_STARTS, ord(ch)) - 1
+    if i >= 0 and ord(ch) <= _RANGES[i][1]:
+        return _RANGES[i][2]
+    return None
+
+
+def trigrams(text):
+    """Character trigrams of each word, padded so word starts and ends count"""
+    grams = Counter()
+    for word in _WORD.findall(text.lower()):
+        padded = " {} ".format(word)
+        for i in range(len(padded) - 2):
+            grams[padded[i:i+3]] += 1
+    return grams
+
+
+def _build_profiles():
+    profiles = {}
+    for lang, sample in samples.items():
+        script = script_of(next(ch for ch in sample if ch.isalpha()))
+        grams = trigrams(sample)
+        profiles.setdefault(script, {})[lang] = (grams, sum(grams.values()), frozenset(sample.lower().split()))
+    return profiles
+
+
+_PROFILES = _build_profiles()
+_VOCABULARY = len({gram for langs in _PROFILES.values() for grams, _, _ in langs.values() for gram in grams}) + 1
+
+
+def _rank(words, grams, candidates):
+    """
+    Score the text against each language, best first: the average
+    log-likelihood per trigram plus a bonus for each word that is one of the
+    language's frequent words.
+    """
+    total = sum(grams.values())
+    scores = []
+    for lang, (profile, size, frequent) in candidates.items():
+        loglik = sum(count * math.log((profile.get(gram, 0) + 1) / (size + _VOCABULARY)) for gram, count in grams.items())
+        known = sum(1 for word in words if word in frequent)
+        scores.append((loglik / total + WORD_WEIGHT * known / len(words), lang))
+    return sorted(scores, reverse=True)
+
+
+def _han(text, share):
+    simplified = sum(1 for ch in text if ch in simplified_only)
+    traditional = sum(1 for ch in text if ch in traditional_only)
+    if simplified == traditional:
+        # No way to tell the scripts apart; Simplified is the likelier guess
+        return "zh-Hans", share * 0.5
+    if simplified > traditional:
+        return "zh-Hans", share * simplified / (simplified + traditional)
+    return "zh-Hant", share * traditional / (simplified + traditional)
+
+
+def identify(text, max_chars=SAMPLE_CHARS):
+    """
+    Guess the language of text from its script and, where several languages
+    share a script, its character trigrams and frequent words. Returns (language code,
+    confidence between 0 and 1), or (None, 0.0) if there is too little text:
+    fewer than MIN_LETTERS letters, or fewer than MIN_WORDS words in a
+    script several languages use.
+    """
+    text = (text or "")[:max_chars]
+    scripts = Counter(script_of(ch) for ch in text if ch.isalpha())
+    scripts.pop(None, None)
+    letters = sum(scripts.values())
+    if letters < MIN_LETTERS:
+        return None, 0.0
+
+    # Japanese mixes kana with Han characters
+    if scripts["kana"]:
+        return "ja", (scripts["kana"] + scripts["han"]) / letters
+    script, count = scripts.most_common(1)[0]
+    share = count / letters
+    if script == "han":
+        return _han(text, share)
+    if script not in _PROFILES:
+        return script, share
+
+    scripted = "".join(ch if script_of(ch) == script else " " for ch in text).lower()
+    words = _WORD.findall(scripted)
+    if len(words) < MIN_WORDS:
+        return None, 0.0
+    grams = trigrams(scripted)
+    ranked = _rank(words, grams, _PROFILES[script])
+    if len(ranked) == 1:
+        return ranked[0][1], share
+    (best, lang), (second, _) = ranked[0], ranked[1]
+    # The margin between the two best languages grows with how distinctive the text is
+    margin = (best - second) * math.sqrt(sum(grams.values()))
+    return lang, share * (1 - math.exp(-margin))
@@ -0,0 +1,50 @@
+# Frequent words for the languages in lang_list that share a script with
+# others. langid builds its character trigram profiles from these, so they
+# favour function words that show up in almost any text.
+samples = {
+'af':"die en van is in wat het ek nie dit om te jy was op hy vir met sy hulle ons moet kan sal baie ook maar nog net meer as oor toe daar by na uit al hier so goed my jou haar hom wees word deur tussen sonder gaan kom waar hoe wanneer omdat alles mense dag jaar weer nou gesê gedoen",
+'ca':"de la i el que a en les per un del els es no amb una al com més però o seu seva ha han són va fer ser aquest aquesta també quan on per què molt tot tots ara sempre mai perquè pot entre sense abans sota sobre any catalunya aquests nosaltres",
+'cs':"a se na v je že to s z do o k i jako ale ve by jsem jsi jsme jste jsou byl byla bylo být které který která jeho její jejich tak jak už jen také když kde proč pro po při od za nebo něco všechno velmi tady teď vždy nikdy protože může musí mezi bez před pod nad roku české",
+'cy':"y yn a o i ar yr ei mae ac roedd wedi ond hefyd gan fel am bod hyn hwn hon sy ydy oedd fydd dim ni chi nhw fi ti hi beth pam ble pryd iawn nawr bob amser byth achos gall rhaid rhwng heb cyn dan dros blwyddyn cymru gyda rhywbeth",
+'da':"og i jeg det at en den til er som på de med han af for ikke der var mig sig men et har om vi min havde ham hun nu over da fra du ud sin dem os op man hans hvor eller hvad skal selv her alle vil blev kunne ind når være dog noget ville jo deres efter ned skulle denne end dette mit også under have dig anden hende mine alt meget sit sine vor mod disse hvis din nogle hos blive mange bliver hendes været sådan",
+'de':"der die und in den von zu das mit sich des auf für ist im dem nicht ein eine als auch es an werden aus er hat dass sie nach wird bei einer um am sind noch wie einem über einen so zum war haben nur oder aber vor zur bis mehr durch man sein wurde sei ich wir ihr können schon wenn habe unter gegen diese damit ob gewesen jetzt immer",
+'en':"the of and to in is that it for was on are as with his they at be this have from or one had by word but not what all were we when your can said there use an each which she do how their if will up other about out many then them these so some her would make like him into time has look two more write go see number no way could people my than first water been call who its now find long down day did get come made may part",
+'es':"de la que el en y a los se del las un por con no una su para es al lo como más pero sus le ya o este sí porque esta entre cuando muy sin sobre también me hasta hay donde quien desde todo nos durante todos uno les ni contra otros ese eso ante ellos esto antes algunos qué unos yo otro otras otra él tanto esa estos mucho quienes nada muchos cual poco ella estar estas algunas algo nosotros",
+'et':"ja on et ei see ta oli kui ka mis nii aga oma siis kas kõik veel seda tema mina sina meie teie nemad olen oled oleme olete nad või kes mida miks kus millal palju juba alati sest pärast enne aasta eesti koos kuid üle ilma ainult selle need seal siin",
+'fi':"olla ja on ei se että hän oli ovat mutta kuin niin joka tai myös kun jos nyt vain tämä sitä sen hänen mitä minä sinä me te he ole olen olet olemme olisi ollut tässä siinä kanssa kaikki mikä kuka miksi missä milloin paljon vielä jo aina koska sekä mukaan jälkeen ennen vuoden vuonna suomen",
+'fil':"ang ng sa na at mga ay para ako ikaw siya kami tayo kayo sila hindi may ito iyan iyon kung pero dahil lang rin din po ba noon ngayon palagi kailanman maaari dapat pagitan wala bago ilalim itaas taon pilipinas",
+'fr':"le de un être et à il avoir ne je son que se qui ce dans en du elle au pour pas vous par sur faire plus dire me on mon lui nous comme mais pouvoir avec tout aller voir bien où sans tu ou leur homme si deux moi vouloir te femme venir quand grand celui notre devoir là jour prendre même votre les des est une sont été cette aussi",
+'hr':"i je u na se da za su s od a ne to što kao ali po iz pri do sam si smo ste bio bila bilo biti koji koja koje njegov njezin njihov tako kako već samo kad gdje zašto nešto sve vrlo ovdje sada uvijek nikada jer može mora između bez prije ispod iznad hrvatske godine",
+'ht':"ak nan ki pa li se yo mwen ou nou la pou te sou men tout gen fè sa lè konsa paske kapab dwe ant san anvan anba anwo ane ayiti tou kounye toujou janm",
+'hu':"a az és hogy nem is egy van meg de el ki mint csak már ez volt még be fel ha vagy sem kell lesz után most minden nagyon itt ott mert azt ezt amikor ahol miért valami mindig soha között nélkül előtt alatt felett magyar évben szerint pedig lehet",
+'id':"yang dan di itu dengan untuk tidak ini dari dalam akan pada juga saya ke karena tersebut bisa ada mereka lebih kami sudah atau kita seperti telah oleh jika hanya bahwa tetapi masih ia sebagai dapat harus banyak saat apa bagaimana kapan dimana mengapa semua sangat sekarang selalu pernah",
+'is':"og að í á er sem til það með var ekki um af en við hann hún þeir þær þau ég þú þið fyrir eftir hafa hefur hafði vera verið voru mjög nú alltaf aldrei vegna getur verður milli án áður undir yfir ár ísland þetta",
+'it':"di che il la e a per un in è non una sono da si con le del mi ma lo ha ho i al della come io anche cosa se questo gli ci più dei nel tu sei alla era delle bene mio tutto ne suo ti fare loro lei sua molto quando già perché essere stato questa dove sempre niente ancora tutti",
+'lt':"ir yra į kad su iš ne o tai bet kaip jis ji jie jos aš tu mes jūs buvo būti bus labai dabar visada niekada nes gali turi tarp be prieš po virš metų lietuvos kuris kuri kurie taip pat",
+'lv':"un ir ar uz no par ka kā bet vai tas tā viņš viņa viņi es tu mēs jūs bija būt būs ļoti tagad vienmēr nekad jo var jābūt starp bez pirms pēc virs gadā latvijas kurš kura kuri arī",
+'mg':"ny sy ary amin ho izy ireo aho ianao isika ianareo dia fa tsy efa koa raha mba mety tokony eo anelanelany misy alohan ambany ambony taona madagasikara izay ilay io ity nefa",
+'ms':"yang dan di itu dengan untuk tidak ini dari dalam akan pada juga saya ke kerana tersebut boleh ada mereka lebih kami sudah atau kita seperti telah oleh jika hanya bahawa tetapi masih ia sebagai dapat perlu banyak semasa apa bagaimana bila mengapa semua sangat sekarang sentiasa pernah",
+'mt':"il ta u li fil għal minn ma huwa hija huma jien int aħna intom kien kienet kienu se ħafna issa dejjem qatt għax jista għandu bejn mingħajr qabel taħt fuq sena malta dan din dawn wkoll",
+'nb':"og i jeg det at en et den til er som på de med han av ikke der så var meg seg men har om vi min mitt ha hadde hun nå over da ved fra du ut sin dem oss opp man kan hans hvor eller hva skal selv her alle vil bli ble blitt kunne inn når være kom noen noe ville dere deres kun ja etter ned skulle denne for deg si sine sitt mot å meget hvorfor dette disse uten hvordan ingen din ditt blir samme hver hvem hvis både bare enn fordi før mange også slik vært siden",
+'nl':"de en van ik te dat die in een hij het niet zijn is was op aan met als voor had er maar om hem dan zou of wat mijn men dit zo door over ze zich bij ook tot je mij uit der daar haar naar heb hoe heeft hebben deze u want nog zal me zij nu geen omdat iets worden toch al waren veel meer doen toen moet ben zonder kan hun dus alles onder ja eens hier wie werd altijd wordt kunnen ons zelf tegen na wil kon niets uw iemand geweest andere",
+'pl':"i w nie na się z że do to jest jak o co ale po tak już za od jego by tylko go jej ich przez czy też może być był była było są jestem jesteś mnie mi ty ja my wy oni one tego tym tej która który które kiedy gdzie dlaczego bardzo więc jeszcze teraz zawsze nigdy wszystko coś ktoś przed pod nad między bez dla przy",
+'pt':"de a o que e do da em um para é com não uma os no se na por mais as dos como mas foi ao ele das tem à seu sua ou ser quando muito há nos já está eu também só pelo pela até isso ela entre era depois sem mesmo aos ter seus quem nas me esse eles estão você tinha foram essa num nem suas meu às minha têm numa pelos elas havia seja qual será nós",
+'ro':"și de în la a cu pe este că nu o un care se din pentru mai ca sunt fost lui au ce prin al ale sau dar acest această după până când unde foarte tot toate acum întotdeauna niciodată poate trebuie între fără înainte sub peste anul românia fi",
+'sk':"a sa na v je že to s z do o k i ako ale vo by som si sme ste sú bol bola bolo byť ktoré ktorý ktorá jeho jej ich tak už len tiež keď kde prečo pre po pri od za alebo niečo všetko veľmi tu teraz vždy nikdy pretože môže musí medzi bez pred pod nad roku slovenskej",
+'sl':"in je v na se da za so z pa ki ne to s bi tudi kot ali po od pri do iz sem si smo ste bil bila bilo biti kateri katera katero njegov njen njihov tako kako že samo ko kje zakaj nekaj vse zelo tukaj zdaj vedno nikoli ker lahko mora med brez pred pod nad",
+'sv':"och det att i en jag hon som han på den med var sig för så till är men ett om hade de av icke mig du henne då sin nu har inte hans honom skulle hennes där min man ej vid kunde något från ut när efter upp vi dem vara vad över än dig kan sina här ha mot alla under någon eller allt mycket sedan ju denna själv detta åt utan varit hur ingen mitt ni bli blev oss din dessa några deras blir mina samma vilken er sådan vår",
+'sw':"na ya wa kwa katika ni la za kuwa hii huo hiyo yeye wao mimi wewe sisi ninyi alikuwa atakuwa sana sasa daima kamwe sababu anaweza lazima kati bila kabla chini juu mwaka tanzania kenya ambaye ambao pia",
+'tr':"ve bir bu da de için ile olarak çok daha en gibi ama sonra kadar olan var yok ben sen o biz siz onlar ne neden nasıl nerede zaman her şey şimdi burada orada çünkü ki mi değil olduğu oldu yıl türkiye arasında önce üzerinde altında tüm bütün",
+'vi':"của và các có được cho là với trong không một những người này đã để khi đến từ như về năm tại theo nhiều cũng đó sẽ ra nhưng lại vào nước việt nam chúng tôi bạn anh ấy cô họ gì sao ở đâu bao giờ rất bây luôn",
+'ru':"и в не на я что он с как а то все она так его но да ты к у же вы за бы по только ее мне было вот от меня еще нет о из ему теперь когда даже ну вдруг ли если уже или ни быть был него до вас нибудь опять уж вам ведь там потом себя ничего ей может они тут где есть надо ней для мы тебя их чем была сам чтоб без будто чего раз тоже себе под будет тогда кто этот россии",
+'uk':"і в не на я що він з як а то все вона так його але ти до у же ви за би по тільки її мені було ось від мене ще немає про із йому тепер коли навіть ну раптом чи якщо вже або ні бути був нього вас знову там потім себе нічого їй може вони тут де є треба ній для ми тебе їх ніж була сам без раз також собі під буде тоді хто цей україни",
+'bg':"и в не на аз че той с като а то всичко тя така неговата но да ти към у вече вие за би по само нейния ми беше ето от мен още няма него сега когато дори ли ако или нито бъде до вас отново там после себе си нищо може те тук къде е трябва ние теб техните сам без път също под ще тогава кой този българия",
+'sr-Cyrl':"и у не на ја да он са као а то све она тако његов али ти ка већ ви за би по само њен ми је било ево од мене још нема о из њему сада када чак ли ако или ни бити био до вас опет тамо после себе ништа може они овде где треба тебе њихов него била сам без пут такође испод ће тада ко овај србије",
+'ar':"في من على أن إلى عن هذا هذه التي الذي مع كان ما لا هو هي كل بين قد ذلك بعد عند لم أو إن ثم حتى لقد كانت الله قال يكون أي غير منذ وقد وهو وكان فيها عليه ولا",
+'fa':"و در به از که این را با است برای آن یک خود تا کرد بر هم نیز شده می شود بود کند ما او من تو آنها شما ها های اما یا اگر چه چرا کجا کی بسیار همیشه هرگز زیرا باید بین بدون قبل زیر روی سال ایران",
+'ur':"کے اور میں کی کو ہے سے پر یہ وہ ہیں نے کہ تھا ایک کا بھی تو ہو کر گیا تھے ان اس جو لیے نہیں کیا کیوں کہاں کب بہت ہمیشہ کبھی کیونکہ سکتا چاہیے درمیان بغیر پہلے نیچے اوپر سال پاکستان",
+}
+
+# Characters that only appear in one of the two Chinese scripts
+simplified_only = "这们说来个时对国会为发经过实现还进动学问长门见么没关开车书东电话让认识点头体万与专业从"
+traditional_only = "這們說來個時對國會為發經過實現還進動學問長門見麼沒關開車書東電話讓認識點頭體萬與專業從"
@@ -0,0 +1,259 @@
+"""
+Client-side pacing for the per-key quotas of the Translator and Vision
+services, so calls wait their turn here instead of being answered with 429.
+
+Each subscription key gets a Quota made of token buckets (calls per second
+and, for Translator, characters per minute). Callers queue for it in
+priority order, interactive before bulk, and the one at the head of the
+queue waits only as long as its buckets need to refill.
+"""
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from app import appvar
+from util import metrics
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE:"interactive", BULK:"bulk"}
+
+# Which quota each kind of call (http_client's call label) counts against
+SERVICES = {
+    "translate":"translator",
+    "detect":"translator",
+    "dictionary":"translator",
+    "languages":"translator",
+    "ocr_submit":"vision",
+    "ocr_poll":"vision"
+}
+
+QUOTA_WAIT_SECONDS = metrics.histogram("translation_app_quota_wait_seconds",
+    "Time calls spent queued for their service's quota", ["service", "priority"])
+
+_priority = contextvars.ContextVar("quota_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def bulk():
+    """Calls made inside this block (and the pools and tasks it starts) queue behind interactive ones"""
+    token = _priority.set(BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def carry(fn):
+    """fn bound to the caller's priority, for handing to a worker thread"""
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+class TokenBucket(object):
+    """
+    rate tokens a second, up to capacity. A take larger than the capacity
+    is allowed once the bucket is full and leaves it in debt, so one large
+    request still gets through and the calls after it pay for it.
+    """
+
+    def __init__(self, rate, capacity, now=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount):
+        """Seconds until amount can be taken, after a refill"""
+        shortfall = min(amount, self.capacity) - self.tokens
+        return max(0.0, shortfall / self.rate)
+
+    def take(self, amount):
+        self.tokens -= amount
+
+    def drain(self, seconds):
+        """Leave the bucket empty for seconds, as after a throttled response"""
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class _Waiter(object):
+    """A queued caller and how to wake it, whether it is a thread or a coroutine"""
+
+    def __init__(self, priority, amounts, event, loop=None):
+        self.priority = priority
+        self.amounts = amounts
+        self.event = event
+        self.loop = loop
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self.event.set)
+
+
+class Quota(object):
+    """
+    Token buckets for one subscription key, shared by threads and
+    coroutines. Only the waiter at the head of the queue ever sleeps on the
+    buckets; the rest sleep until they reach the head.
+    """
+
+    def __init__(self, name, calls_per_second=0, chars_per_minute=0, burst_seconds=1.0):
+        self.name = name
+        self._buckets = {}
+        if calls_per_second > 0:
+            self._buckets["calls"] = TokenBucket(calls_per_second, max(1.0, calls_per_second * burst_seconds))
+        if chars_per_minute > 0:
+            self._buckets["chars"] = TokenBucket(chars_per_minute / 60.0, max(1.0, chars_per_minute / 60.0 * burst_seconds))
+        self._queue = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def waiting(self):
+        """{priority: number of callers queued}"""
+        with self._lock:
+            counts = dict.fromkeys(PRIORITY_NAMES, 0)
+            for _, _, waiter in self._queue:
+                counts[waiter.priority] += 1
+            return counts
+
+    def throttled(self, seconds):
+        """The service answered 429; hold everyone back for seconds"""
+        with self._lock:
+            now = time.monotonic()
+            for bucket in self._buckets.values():
+                bucket.refill(now)
+                bucket.drain(seconds)
+
+    def _enqueue(self, waiter):
+        with self._lock:
+            heapq.heappush(self._queue, (waiter.priority, next(self._order), waiter))
+
+    def _try(self, waiter):
+        """0 once granted, else the seconds to wait, or None to wait until woken"""
+        with self._lock:
+            if self._queue[0][2] is not waiter:
+                return None
+            now = time.monotonic()
+            delay = 0.0
+            for kind, bucket in self._buckets.items():
+                bucket.refill(now)
+                delay = max(delay, bucket.wait_for(waiter.amounts.get(kind, 0)))
+            if delay > 0:
+                return delay
+            for kind, bucket in self._buckets.items():
+                bucket.take(waiter.amounts.get(kind, 0))
+            heapq.heappop(self._queue)
+            if self._queue:
+                self._queue[0][2].wake()
+            return 0
+
+    def _abandon(self, waiter):
+        with self._lock:
+            was_head = self._queue and self._queue[0][2] is waiter
+            self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+            heapq.heapify(self._queue)
+            if was_head and self._queue:
+                self._queue[0][2].wake()
+
+    def acquire(self, chars=0, priority=None):
+        """Block until a call sending chars characters fits the quota; returns the seconds waited"""
+        if not self._buckets:
+            return 0.0
+        priority = current_priority() if priority is None else priority
+        waiter = _Waiter(priority, {"calls":1, "chars":chars}, threading.Event())
+        start = time.time()
+        self._enqueue(waiter)
+        try:
+            while True:
+                waiter.event.clear()
+                delay = self._try(waiter)
+                if delay == 0:
+                    break
+                waiter.event.wait(delay)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        waited = time.time() - start
+        QUOTA_WAIT_SECONDS.observe(waited, service=self.name, priority=PRIORITY_NAMES[priority])
+        return waited
+
+    async def acquire_async(self, chars=0, priority=None):
+        """The coroutine version of acquire; waiting holds no thread"""
+        if not self._buckets:
+            return 0.0
+        priority = current_priority() if priority is None else priority
+        waiter = _Waiter(priority, {"calls":1, "chars":chars}, asyncio.Event(), asyncio.get_event_loop())
+        start = time.time()
+        self._enqueue(waiter)
+        try:
+            while True:
+                waiter.event.clear()
+                delay = self._try(waiter)
+                if delay == 0:
+                    break
+                if delay is None:
+                    await waiter.event.wait()
+                else:
+                    # Nobody is ahead; a higher priority arrival takes the head itself
+                    await asyncio.sleep(delay)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        waited = time.time() - start
+        QUOTA_WAIT_SECONDS.observe(waited, service=self.name, priority=PRIORITY_NAMES[priority])
+        return waited
+
+
+_quotas = {}
+_quotas_lock = threading.Lock()
+
+
+def _limits(service):
+    config = appvar.config
+    if service == "translator":
+        return config["TRANSLATOR_CALLS_PER_SECOND"], config["TRANSLATOR_CHARS_PER_MINUTE"]
+    return config["VISION_CALLS_PER_SECOND"], 0
+
+
+def for_request(call, headers):
+    """The Quota a call with these headers counts against, or None if it isn't metered"""
+    service = SERVICES.get(call)
+    if service is None:
+        return None
+    key = (headers or {}).get("Ocp-Apim-Subscription-Key")
+    with _quotas_lock:
+        if (service, key) not in _quotas:
+            calls_per_second, chars_per_minute = _limits(service)
+            quota = None
+            if calls_per_second > 0 or chars_per_minute > 0:
+                quota = Quota(service, calls_per_second, chars_per_minute, appvar.config["QUOTA_BURST_SECONDS"])
+            _quotas[(service, key)] = quota
+        return _quotas[(service, key)]
+
+
+def _queue_depths():
+    depths = {}
+    with _quotas_lock:
+        quotas = [quota for quota in _quotas.values() if quota is not None]
+    for quota in quotas:
+        for priority, count in quota.waiting().items():
+            key = (quota.name, PRIORITY_NAMES[priority])
+            depths[key] = depths.get(key, 0) + count
+    return depths
+
+metrics.gauge("translation_app_quota_queue_depth", "Calls queued for their service's quota",
+    ["service", "priority"], callback=_queue_depths)
@@ -0,0 +1,122 @@
+import re
+
+# Translator v3 per-request limits
+MAX_ELEMENTS = 100
+MAX_CHARS = 5000
+
+_PARAGRAPH_BREAK = re.compile(r'\n[ \t\r\f\v]*\n\s*')
+# CJK full stops are usually not followed by a space
+_SENTENCE_END = re.compile(r'(?<=[.!?।])\s+|(?<=[。！？])\s*')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _pieces(text, pattern):
+    """Split text on pattern into (chunk, separator) pairs, keeping the separators."""
+    pieces = []
+    pos = 0
+    for match in pattern.finditer(text):
+        pieces.append((text[pos:match.start()], match.group(0)))
+        pos = match.end()
+    pieces.append((text[pos:], ""))
+    return pieces
+
+
+def _fit(chunk, tail, max_chars, patterns):
+    """
+    Yield (text, tail) pairs no longer than max_chars. The chunk is split on
+    the first pattern and neighbouring pieces are merged back together while
+    they fit, falling through to the next pattern for pieces that are still
+    too long and to a hard cut when no pattern is left.
+    """
+    if len(chunk) <= max_chars:
+        yield chunk, tail
+        return
+
+    if not patterns:
+        for start in range(0, len(chunk), max_chars):
+            end = start + max_chars
+            yield chunk[start:end], tail if end >= len(chunk) else ""
+        return
+
+    current, current_tail = "", ""
+    for piece, separator in _pieces(chunk, patterns[0]):
+        for text, text_tail in _fit(piece, separator, max_chars, patterns[1:]):
+            if not text:
+                current_tail += text_tail
+            elif current and len(current) + len(current_tail) + len(text) <= max_chars:
+                current = current + current_tail + text
+                current_tail = text_tail
+            else:
+                if current:
+                    yield current, current_tail
+                current, current_tail = text, text_tail
+    yield current, current_tail + tail
+
+
+def segment(text, max_chars=MAX_CHARS, sentences=False):
+    """
+    Break text into paragraph-sized segments that each fit in a single
+    Translator element, splitting overlong paragraphs at sentence and then
+    word boundaries. With sentences=True every sentence becomes its own
+    segment, which is what the translation memory matches on.
+
+    Returns (head, segments) where head is any leading whitespace and
+    segments is a list of (text, tail) pairs; tail is the whitespace that
+    followed the segment in the original so the layout can be rebuilt with
+    join().
+    """
+    if not text:
+        return "", []
+
+    body = text.lstrip()
+    head = text[:len(text) - len(body)]
+
+    segments = []
+    for paragraph, gap in _pieces(body, _PARAGRAPH_BREAK):
+        stripped = paragraph.rstrip()
+        gap = paragraph[len(stripped):] + gap
+        if not stripped:
+            if segments:
+                last_text, last_tail = segments[-1]
+                segments[-1] = (last_text, last_tail + gap)
+            else:
+                head += gap
+            continue
+
+        if not sentences:
+            segments.extend(_fit(stripped, gap, max_chars, [_SENTENCE_END, _WHITESPACE]))
+            continue
+
+        pieces = [(sentence, separator) for sentence, separator in _pieces(stripped, _SENTENCE_END) if sentence]
+        for index, (sentence, separator) in enumerate(pieces):
+            if index == len(pieces) - 1:
+                separator += gap
+            segments.extend(_fit(sentence, separator, max_chars, [_WHITESPACE]))
+
+    return head, segments
+
+
+def join(head, segments, texts):
+    """Rebuild a document from segment tails and (translated) segment texts."""
+    return head + "".join(text + tail for text, (_, tail) in zip(texts, segments))
+
+
+def pack(texts, max_elements=MAX_ELEMENTS, max_chars=MAX_CHARS):
+    """
+    Greedily group consecutive texts into batches that respect the
+    per-request element and character limits. Returns a list of lists of
+    indices into texts.
+    """
+    batches = []
+    current = []
+    current_chars = 0
+    for index, text in enumerate(texts):
+        if current and (len(current) >= max_elements or current_chars + len(text) > max_chars):
+            batches.append(current)
+            current = []
+            current_chars = 0
+        current.append(index)
+        current_chars += len(text)
+    if current:
+        batches.append(current)
+    return batches
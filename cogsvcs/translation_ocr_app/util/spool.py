@@ -0,0 +1,129 @@
+import io
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+CHUNK_SIZE = 64 * 1024
+PREFIX = "translation-spool-"
+
+
+class SpoolFullError(RuntimeError):
+    pass
+
+
+class Spool(object):
+    """
+    Holds uploads while they are processed. Anything up to memory_max bytes
+    stays in memory, as long as all uploads in memory together stay within
+    memory_quota bytes; the rest are written to a temp file in directory,
+    with all spooled files together limited to quota bytes. Spooled files
+    are always removed when the upload has been processed.
+    """
+
+    def __init__(self, directory=None, memory_max=8*1024*1024, quota=512*1024*1024, memory_quota=64*1024*1024,
+            stale_after=3600):
+        self.directory = directory or tempfile.gettempdir()
+        self.memory_max = memory_max
+        self.quota = quota
+        self.memory_quota = memory_quota
+        self._used = 0
+        self._in_memory = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self.clean_stale(stale_after)
+
+    def clean_stale(self, older_than):
+        """Remove spool files left behind by a process that died mid-upload"""
+        cutoff = time.time() - older_than
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.startswith(PREFIX):
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def used(self):
+        with self._lock:
+            return self._used
+
+    def _reserve(self, size):
+        with self._lock:
+            if self._used + size > self.quota:
+                raise SpoolFullError("Upload spool is full, try again shortly")
+            self._used += size
+
+    def _release(self, size):
+        with self._lock:
+            self._used -= size
+
+    def memory_used(self):
+        with self._lock:
+            return self._in_memory
+
+    def _reserve_memory(self, size):
+        """True if size more bytes fit in memory, and they are counted"""
+        with self._lock:
+            if self._in_memory + size > self.memory_quota:
+                return False
+            self._in_memory += size
+            return True
+
+    def _release_memory(self, size):
+        with self._lock:
+            self._in_memory -= size
+
+    @contextmanager
+    def open(self, stream):
+        """
+        Copy stream into the spool and yield a seekable file object positioned
+        at the start. Raises SpoolFullError if an upload that has to go to
+        disk would take the spool over quota.
+        """
+        buffer = io.BytesIO()
+        spooled = None
+        reserved = 0
+        in_memory = 0
+        try:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if spooled is None and (buffer.tell() + len(chunk) > self.memory_max
+                        or not self._reserve_memory(len(chunk))):
+                    # Too big for memory, or memory is taken by other uploads,
+                    # so move what we have so far to disk
+                    self._release_memory(in_memory)
+                    in_memory = 0
+                    self._reserve(buffer.tell())
+                    reserved = buffer.tell()
+                    spooled = tempfile.NamedTemporaryFile(prefix=PREFIX, dir=self.directory, delete=False)
+                    spooled.write(buffer.getvalue())
+                    buffer = None
+                if spooled is not None:
+                    self._reserve(len(chunk))
+                    reserved += len(chunk)
+                    spooled.write(chunk)
+                else:
+                    in_memory += len(chunk)
+                    buffer.write(chunk)
+
+            document = spooled if spooled is not None else buffer
+            document.flush()
+            document.seek(0)
+            yield document
+        finally:
+            if spooled is not None:
+                spooled.close()
+                try:
+                    os.remove(spooled.name)
+                except OSError:
+                    pass
+            if reserved:
+                self._release(reserved)
+            if in_memory:
+                self._release_memory(in_memory)
@@ -1,16 +1,149 @@
 from azure.storage.blob import BlockBlobService
 import os
 from app import appvar
-from werkzeug.utils import secure_filename
+from util import metrics
+from util import translation_cache
 import azure.storage.blob as azureblob
 import azure.storage.blob.sharedaccesssignature as sasblob
+from azure.storage.blob.models import BlobBlock, ContentSettings
 from datetime import datetime, timedelta
-import uuid
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import base64
+import hashlib
+import io
+import mimetypes
+import threading
+import traceback
+
+BLOB_UPLOAD_SECONDS = metrics.histogram("translation_app_blob_upload_seconds", "Time to upload a blob")
+BLOB_UPLOADED_BYTES = metrics.counter("translation_app_blob_uploaded_bytes_total", "Bytes uploaded to blob storage")
+SAS_SECONDS = metrics.histogram("translation_app_sas_generation_seconds", "Time to generate a blob SAS URL")
+BLOB_DEDUPLICATED = metrics.counter("translation_app_blob_deduplicated_total",
+    "Uploads not stored because a blob with the same content already existed")
+ARCHIVE_FAILURES = metrics.counter("translation_app_archive_failures_total",
+    "Background archive uploads that failed and were dropped")
+
+_known_blobs = translation_cache.MemoryCache(max_size=10000, ttl=24*3600)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+_upload_pool = None
+_upload_pool_lock = threading.Lock()
+
+_archive_pool = None
+_archive_pool_lock = threading.Lock()
+
+def get_blob_client(account_name=None, account_key=None):
+    """
+    Return the shared BlockBlobService for the account, creating it on first
+    use so its connection pool is reused across requests.
+    """
+    account_name = account_name or appvar.config["BLOB_ACCT_NAME"]
+    account_key = account_key or appvar.config["BLOB_KEY"]
+
+    with _clients_lock:
+        client = _clients.get((account_name, account_key))
+        if client is None:
+            # BLOB_ENDPOINT points the client somewhere other than Azure, e.g. the load-test stub
+            client = BlockBlobService(account_name = account_name, account_key = account_key,
+                custom_domain = appvar.config["BLOB_ENDPOINT"])
+            _clients[(account_name, account_key)] = client
+    return client
+
+def upload_pool():
+    global _upload_pool
+    with _upload_pool_lock:
+        if _upload_pool is None:
+            _upload_pool = ThreadPoolExecutor(max_workers=appvar.config["BLOB_UPLOAD_WORKERS"])
+    return _upload_pool
+
+def upload_stream(stream, blob_name, container_name="ocrimages", content_type=None):
+    """
+    Upload a file-like object in fixed-size blocks, several blocks at a time,
+    then commit the block list. At most BLOB_UPLOAD_WORKERS blocks are held in
+    memory at once. Returns the number of bytes uploaded.
+    """
+    with BLOB_UPLOAD_SECONDS.time():
+        uploaded = _upload_blocks(stream, blob_name, container_name, content_type)
+    BLOB_UPLOADED_BYTES.inc(uploaded)
+    return uploaded
+
+def _upload_blocks(stream, blob_name, container_name, content_type):
+    blob_client = get_blob_client()
+    block_size = appvar.config["BLOB_BLOCK_SIZE"]
+    max_in_flight = appvar.config["BLOB_UPLOAD_WORKERS"]
+    content_settings = ContentSettings(content_type=content_type) if content_type else None
+
+    block = stream.read(block_size)
+    if len(block) < block_size:
+        # Everything fits in one block, so a single put is cheaper
+        blob_client.create_blob_from_bytes(container_name=container_name, blob_name=blob_name, blob=block,
+            content_settings=content_settings)
+        return len(block)
+
+    block_ids = []
+    in_flight = deque()
+    total = 0
+    while block:
+        # Block ids must all be the same length within a blob
+        block_id = base64.b64encode("{:08d}".format(len(block_ids)).encode()).decode()
+        in_flight.append(upload_pool().submit(blob_client.put_block, container_name, blob_name, block, block_id))
+        block_ids.append(block_id)
+        total += len(block)
+
+        if len(in_flight) >= max_in_flight:
+            in_flight.popleft().result()
+        block = stream.read(block_size)
+
+    for future in in_flight:
+        future.result()
+
+    blob_client.put_block_list(container_name, blob_name, [BlobBlock(id=block_id) for block_id in block_ids],
+        content_settings=content_settings)
+    return total
+
+def content_digest(stream):
+    """The SHA-256 of a seekable stream's content, leaving it back at the start"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(appvar.config["BLOB_BLOCK_SIZE"]), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+def content_type_for(filename, content_type=None):
+    """The type to store a blob with, guessed from the upload's name if it wasn't sent"""
+    if content_type and content_type != "application/octet-stream":
+        return content_type
+    return mimetypes.guess_type(filename)[0] or content_type
+
+def blob_exists(blob_name, container_name="ocrimages"):
+    # Content-addressed blobs never change, so once seen they needn't be checked again
+    if _known_blobs.get((container_name, blob_name)):
+        return True
+    exists = get_blob_client().exists(container_name, blob_name)
+    if exists:
+        _known_blobs.set((container_name, blob_name), True)
+    return exists
+
+def save_content(stream, digest, filename, content_type=None):
+    """
+    Store stream under its content's digest unless a blob with that content
+    is already there, keeping its type in the blob's content settings rather
+    than its name. Returns the blob name.
+    """
+    blob_name = digest
+    if blob_exists(blob_name):
+        BLOB_DEDUPLICATED.inc()
+        return blob_name
+
+    upload_stream(stream, blob_name, content_type=content_type_for(filename, content_type))
+    _known_blobs.set(("ocrimages", blob_name), True)
+    return blob_name
 
 def save_image(request, filefield):
 
-    blob_client = BlockBlobService(account_name = appvar.config["BLOB_ACCT_NAME"],account_key = appvar.config["BLOB_KEY"])
-    
     filestorage = request.files.get(filefield)
 
     if filestorage is None:
@@ -18,18 +151,43 @@ def save_image(request, filefield):
 
     if filestorage.filename == "":
         raise FileNotFoundError("File blank")
-    
-    file_name, ext = os.path.splitext(filestorage.filename)
-    file_name_rand = file_name + str(uuid.uuid4()) + ext
-    
-    file_name_secure = secure_filename(file_name_rand)
 
-    content = filestorage.read()
-    blob_client.create_blob_from_bytes(container_name="ocrimages", blob_name=file_name_secure, blob=content)
-    
-    return file_name_secure
+    digest = content_digest(filestorage.stream)
+    return save_content(filestorage.stream, digest, filestorage.filename, filestorage.mimetype)
+
+def save_bytes(content, filename, content_type=None):
+    """Archive an image that is already in memory, returning its blob name"""
+    return save_content(io.BytesIO(content), hashlib.sha256(content).hexdigest(), filename, content_type)
+
+def archive_bytes(content, filename, content_type=None):
+    """
+    save_bytes for copies nobody waits on: a failure is logged and counted
+    rather than raised, and None returned in place of the blob name.
+    """
+    try:
+        return save_bytes(content, filename, content_type)
+    except Exception:
+        ARCHIVE_FAILURES.inc()
+        print("Could not archive {}:".format(filename))
+        traceback.print_exc()
+        return None
+
+def save_bytes_async(content, filename, content_type=None):
+    """
+    Archive an image in the background. Archiving has its own small pool so
+    a slow or retrying upload never holds up OCR work.
+    """
+    global _archive_pool
+    with _archive_pool_lock:
+        if _archive_pool is None:
+            _archive_pool = ThreadPoolExecutor(max_workers=appvar.config["BLOB_ARCHIVE_WORKERS"])
+    return _archive_pool.submit(archive_bytes, content, filename, content_type)
 
 def generate_img_url(blob_name):
+    with SAS_SECONDS.time():
+        return _generate_img_url(blob_name)
+
+def _generate_img_url(blob_name):
     # Blob SAS Signature setup
     read_write = azureblob.models.BlobPermissions(read=True, add=True,create=True,write=True)
 
@@ -45,4 +203,5 @@ def generate_img_url(blob_name):
             start=datetime.utcnow(), id=None
     )
 
-    return "https://{}.blob.core.windows.net/ocrimages/{}?{}".format(appvar.config["BLOB_ACCT_NAME"], blob_name, sas_sig_param)
+    endpoint = appvar.config["BLOB_ENDPOINT"] or "https://{}.blob.core.windows.net".format(appvar.config["BLOB_ACCT_NAME"])
+    return "{}/ocrimages/{}?{}".format(endpoint.rstrip("/"), blob_name, sas_sig_param)
@@ -0,0 +1,90 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(text):
+    """Collapse whitespace so re-cracked or re-wrapped sentences still match"""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def segment_hash(text):
+    return hashlib.sha256(normalize(text).encode("utf-8")).hexdigest()
+
+
+class TranslationMemory(object):
+    """
+    A persistent store of translated segments per language pair. Unlike the
+    result cache, entries do not expire: a sentence translated once is
+    reused every time the same sentence shows up in a later revision.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            "from_lang TEXT NOT NULL, to_lang TEXT NOT NULL, hash TEXT NOT NULL, "
+            "source TEXT NOT NULL, target TEXT NOT NULL, "
+            "language TEXT, score REAL, created REAL NOT NULL, "
+            "PRIMARY KEY (from_lang, to_lang, hash))"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.chars_saved = 0
+
+    def lookup(self, from_lang, to_lang, texts):
+        """
+        Return {index: result} for every text already in memory for the
+        language pair. Results have the same shape as translate_text.
+        """
+        hashes = [segment_hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound parameter limit
+            unique = list(set(hashes))
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start+500]
+                rows = self._conn.execute(
+                    "SELECT hash, target, language, score FROM segments "
+                    "WHERE from_lang = ? AND to_lang = ? AND hash IN ({})".format(",".join("?" * len(chunk))),
+                    [from_lang or "auto", to_lang] + chunk
+                ).fetchall()
+                for row in rows:
+                    found[row[0]] = {"content":row[1], "language": {"language":row[2], "score":row[3]}}
+
+            results = {}
+            for index, (text, digest) in enumerate(zip(texts, hashes)):
+                if digest in found:
+                    results[index] = found[digest]
+                    self.hits += 1
+                    self.chars_saved += len(text)
+                else:
+                    self.misses += 1
+        return results
+
+    def store(self, from_lang, to_lang, texts, results):
+        """Remember the translation of each text, skipping failed ones"""
+        now = time.time()
+        rows = [
+            (from_lang or "auto", to_lang, segment_hash(text), normalize(text), result["content"],
+                result["language"]["language"], result["language"]["score"], now)
+            for text, result in zip(texts, results)
+            if result["language"]["language"] != "Error"
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO segments "
+                "(from_lang, to_lang, hash, source, target, language, score, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def stats(self):
+        return {"hits":self.hits, "misses":self.misses, "chars_saved":self.chars_saved}